@@ -0,0 +1,657 @@
+"""Offline benchmarks for the chat-finder hot paths.
+
+Builds a synthetic server (channels, authors, text and attachment mix) into
+a scratch database, then drives the real commands (find, index, stats,
+summary, summarypdf, activity, indexall) and the on_message ingest path against
+fake Discord objects: channels whose async history() pages like the API,
+with a configurable per-page latency and a shared rate limit bucket, and a
+gateway stand-in so nothing connects.
+
+    python bench.py                          # 10k rows
+    python bench.py --sizes 10k,1M,10M       # the full ladder
+    python bench.py --json out.json          # save results
+    python bench.py --baseline out.json      # exit 1 on p50 regressions
+    python bench.py --archive                # queries over archived months
+
+Generated databases are kept in --data-dir and reused for the same size,
+seed and end day, since the 1M/10M ones take a while to build.
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import time
+import tracemalloc
+import types
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+
+DISCORD_EPOCH = 1420070400000
+FILLER = ("the a to and is it you that of in for on was this with just i we "
+          "so but lol ok yeah what when why how now later today tomorrow "
+          "anyone here there good bad new old think know see come go get "
+          "make time people really sure maybe".split())
+ATTACHMENTS = (("png", "image/png"), ("jpg", "image/jpeg"), ("gif", "image/gif"),
+               ("mp4", "video/mp4"), ("mov", "video/quicktime"),
+               ("pdf", "application/pdf"), ("zip", "application/zip"),
+               ("txt", "text/plain"))
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    scale = {"k": 1000, "m": 1000000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * scale)
+
+
+# ---------- Fake Discord ----------
+class FakeUser:
+
+    def __init__(self, id, name, bot=False):
+        self.id = id
+        self.name = name
+        self.display_name = name
+        self.bot = bot
+        self.mention = f"<@{id}>"
+
+    def __str__(self):
+        return self.name
+
+
+class FakeAttachment:
+
+    def __init__(self, id, channel_id, filename, content_type, size):
+        self.id = id
+        self.filename = filename
+        self.content_type = content_type
+        self.size = size
+        self.url = (f"https://cdn.discordapp.com/attachments/{channel_id}/"
+                    f"{id}/{filename}")
+
+
+class FakeMessage:
+
+    def __init__(self, id, channel, author, content, attachments):
+        self.id = id
+        self.channel = channel
+        self.guild = channel.guild
+        self.author = author
+        self.content = content
+        self.attachments = attachments
+        self.created_at = datetime.fromtimestamp(
+            ((id >> 22) + DISCORD_EPOCH) / 1000, tz=timezone.utc)
+
+
+class FakeRateLimit:
+    """Bucket shared by channels: `rate` history pages a second. Past that a
+    page gets the 429 warning discord.py logs, then sleeps and retries the
+    way discord.py does for waits under max_ratelimit_timeout."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.recent = deque()
+        self.hits = 0
+
+    async def acquire(self, channel):
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            while self.recent and now - self.recent[0] >= 1:
+                self.recent.popleft()
+            if len(self.recent) < self.rate:
+                self.recent.append(now)
+                return
+            retry_after = 1 - (now - self.recent[0])
+            self.hits += 1
+            logging.getLogger("discord.http").warning(
+                "We are being rate limited. %s %s responded with 429. "
+                "Retrying in %.2f seconds.", "GET",
+                f"https://discord.com/api/v10/channels/{channel.id}/messages",
+                retry_after)
+            await asyncio.sleep(retry_after)
+
+
+class FakeChannel:
+    """Text channel whose history() pages 100 messages at a time and waits
+    `latency` seconds per page, like the REST endpoint. With a `limiter`
+    every page also goes through that FakeRateLimit."""
+
+    def __init__(self, id, guild, name, messages=(), latency=0.0):
+        self.id = id
+        self.guild = guild
+        self.name = name
+        self.mention = f"<#{id}>"
+        self.messages = list(messages)  # oldest first
+        self.latency = latency
+        self.limiter = None
+        self.pages = 0
+
+    def __str__(self):
+        return self.name
+
+    def permissions_for(self, member):
+        return types.SimpleNamespace(read_message_history=True)
+
+    async def history(self, limit=100, before=None, after=None,
+                      oldest_first=None):
+        if oldest_first is None:
+            oldest_first = after is not None
+        msgs = self.messages
+        if after is not None:
+            msgs = [m for m in msgs if m.id > after.id]
+        if before is not None:
+            msgs = [m for m in msgs if m.id < before.id]
+        if not oldest_first:
+            msgs = msgs[::-1]
+        if limit is not None:
+            msgs = msgs[:limit]
+        for i in range(0, len(msgs), 100):
+            await self._page()
+            for m in msgs[i:i + 100]:
+                yield m
+        if not msgs:
+            await self._page()
+
+    async def _page(self):
+        self.pages += 1
+        if self.limiter is not None:
+            await self.limiter.acquire(self)
+        await asyncio.sleep(self.latency)
+
+
+class FakeGuild:
+
+    def __init__(self, id, name="bench"):
+        self.id = id
+        self.name = name
+        self.text_channels = []
+        self.members = {}
+        self.threads = []
+        self.me = None
+        self.filesize_limit = 25 * 1024 * 1024
+
+    def get_channel(self, id):
+        for ch in self.text_channels:
+            if ch.id == id:
+                return ch
+        return None
+
+    get_channel_or_thread = get_channel
+
+    def get_member(self, id):
+        return self.members.get(id)
+
+
+class FakeContext:
+    """Enough of commands.Context for the chat-finder commands; sent
+    messages and files are counted, not kept."""
+
+    def __init__(self, guild, channel, author):
+        self.guild = guild
+        self.channel = channel
+        self.author = author
+        self.bot = core.bot
+        self.message = types.SimpleNamespace(channel_mentions=[])
+        self.voice_client = None
+        self.sent = 0
+        self.sent_bytes = 0
+
+    async def send(self, content=None, file=None, files=None, **kwargs):
+        self.sent += 1
+        self.sent_bytes += len(content or "")
+        for f in ([file] if file else []) + list(files or []):
+            fp = getattr(f, "fp", None)
+            if hasattr(fp, "read"):
+                self.sent_bytes += len(fp.read())
+                fp.close()
+
+    async def trigger_typing(self):
+        pass
+
+
+# ---------- Synthetic data ----------
+class SyntheticChat:
+    """Deterministic message stream for a fake guild.
+
+    Authors and channels are Zipf-weighted, text mixes filler words with
+    the default topic keywords, and `attachment_rate` of the messages
+    carry one or two files. Messages are spread evenly over `days` days
+    ending at `end_ms`, so snowflakes are increasing.
+    """
+
+    def __init__(self, seed=1, channels=20, authors=500, days=365,
+                 attachment_rate=0.05, bot_rate=0.02, topic_rate=0.3,
+                 words=12, end_ms=None):
+        self.seed = seed
+        self.guild = FakeGuild(10_000 + seed)
+        self.authors = [FakeUser(100_000 + i, f"user{i}") for i in range(authors)]
+        self.bots = [FakeUser(900_000 + i, f"bot{i}", bot=True) for i in range(3)]
+        for user in self.authors:
+            self.guild.members[user.id] = user
+        self.channels = [FakeChannel(200_000 + i, self.guild, f"channel-{i}")
+                         for i in range(channels)]
+        self.guild.text_channels = list(self.channels)
+        self.days = days
+        self.attachment_rate = attachment_rate
+        self.bot_rate = bot_rate
+        self.topic_rate = topic_rate
+        self.words = words
+        self.end_ms = end_ms
+        self.keywords = [kw for kws in core.DEFAULT_CATEGORIES.values()
+                         for kw in kws]
+        self._author_weights = self._zipf(authors)
+        self._channel_weights = self._zipf(channels)
+        self._word_weights = self._zipf(len(FILLER))
+
+    @staticmethod
+    def _zipf(n, s=1.1):
+        total, cum = 0.0, []
+        for rank in range(1, n + 1):
+            total += 1 / rank ** s
+            cum.append(total)
+        return cum
+
+    def messages(self, n, channel=None, id_offset=0, start_ms=None,
+                 span_ms=None):
+        """Yields n FakeMessages, oldest first, over the generator's whole
+        range unless `start_ms`/`span_ms` pick another one."""
+        rng = random.Random(self.seed * 1_000_003 + id_offset)
+        span = span_ms or self.days * 86_400_000
+        if start_ms is None:
+            start_ms = self.end_ms - span
+        step = span / max(n, 1)
+        for i in range(n):
+            ts = int(start_ms + i * step)
+            mid = ((ts - DISCORD_EPOCH) << 22) | ((i + id_offset) & 0x3FFFFF)
+            ch = channel or rng.choices(self.channels,
+                                        cum_weights=self._channel_weights)[0]
+            if rng.random() < self.bot_rate:
+                author = rng.choice(self.bots)
+            else:
+                author = rng.choices(self.authors,
+                                     cum_weights=self._author_weights)[0]
+            words = rng.choices(FILLER, cum_weights=self._word_weights,
+                                k=max(1, int(rng.expovariate(1 / self.words))))
+            if rng.random() < self.topic_rate:
+                words.insert(rng.randrange(len(words) + 1),
+                             rng.choice(self.keywords))
+            atts = []
+            if rng.random() < self.attachment_rate:
+                for k in range(rng.choice((1, 1, 2))):
+                    ext, ctype = rng.choice(ATTACHMENTS)
+                    atts.append(FakeAttachment(mid + k + 1, ch.id,
+                                               f"file{i}_{k}.{ext}", ctype,
+                                               rng.randrange(1_000, 5_000_000)))
+            yield FakeMessage(mid, ch, author, " ".join(words), atts)
+
+
+# ---------- Harness ----------
+class Result:
+
+    def __init__(self, name, timings, items=0, peak_mb=None):
+        self.name = name
+        self.timings = sorted(timings)
+        self.items = items
+        self.peak_mb = peak_mb
+
+    def pct(self, q):
+        t = self.timings
+        return t[min(len(t) - 1, int(round(q * (len(t) - 1))))]
+
+    def as_dict(self):
+        p50 = self.pct(0.5)
+        return {
+            "runs": len(self.timings),
+            "p50_ms": p50 * 1000,
+            "p95_ms": self.pct(0.95) * 1000,
+            "max_ms": self.timings[-1] * 1000,
+            "items_per_s": self.items / p50 if self.items and p50 else None,
+            "peak_mb": self.peak_mb,
+        }
+
+
+async def measure(name, fn, repeat, items=0, setup=None):
+    """Times `repeat` runs of the coroutine function `fn`, then one more
+    under tracemalloc for the peak Python allocation."""
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            await setup()
+        start = time.perf_counter()
+        await fn()
+        timings.append(time.perf_counter() - start)
+    if setup:
+        await setup()
+    tracemalloc.start()
+    try:
+        await fn()
+        peak = tracemalloc.get_traced_memory()[1] / 1048576
+    finally:
+        tracemalloc.stop()
+    result = Result(name, timings, items, peak)
+    d = result.as_dict()
+    rate = f"{d['items_per_s']:>12,.0f}/s" if d["items_per_s"] else " " * 14
+    print(f"  {name:<22} p50 {d['p50_ms']:>9.1f}ms  p95 {d['p95_ms']:>9.1f}ms  "
+          f"{rate}  peak {d['peak_mb']:>7.1f}MB", flush=True)
+    return result
+
+
+def use_database(database, path):
+    # the extensions read both through the core module
+    core.db = database
+    core.DB_PATH = path
+
+
+async def open_database(args, rows, gen):
+    """Points core.db at a scratch database holding `rows` synthetic
+    messages, building it first unless a matching one is kept. Returns the
+    build timings (none when reused)."""
+    os.makedirs(args.data_dir, exist_ok=True)
+    end_day = datetime.fromtimestamp(gen.end_ms / 1000,
+                                     core.LOCAL_TZ).strftime("%Y%m%d")
+    stem = os.path.join(args.data_dir, f"bench_{rows}_{args.seed}_{end_day}"
+                        + ("_archived" if args.archive else ""))
+    path = stem + ".db"
+    meta = {"rows": rows, "seed": args.seed, "channels": args.channels,
+            "authors": args.authors, "days": args.days,
+            "attachment_rate": args.attachment_rate}
+    reuse = False
+    if not args.fresh and os.path.exists(path) and os.path.exists(stem + ".json"):
+        with open(stem + ".json") as f:
+            reuse = json.load(f) == meta
+    core.archive.root = stem + "_archive"
+    if not reuse:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        shutil.rmtree(core.archive.root, ignore_errors=True)
+    if core.db is not None:
+        await asyncio.to_thread(core.db.close)
+    use_database(core.Database(path, core.DB_READERS), path)
+    await core.db.write(core.init_schema)
+    if reuse:
+        print(f"  reusing {path}")
+        return []
+    batch, start = [], time.perf_counter()
+    for m in gen.messages(rows):
+        if m.author.bot:
+            continue
+        batch.append((core.message_row(m), core.attachment_rows(m)))
+        if len(batch) >= 5000:
+            await core.db.write(core.save_messages, batch)
+            batch = []
+    if batch:
+        await core.db.write(core.save_messages, batch)
+    # every channel counts as fully indexed
+    now_ms = int(time.time() * 1000)
+    await core.db.executemany(
+        "INSERT OR REPLACE INTO index_checkpoints "
+        "(channel_id, guild_id, newest_id, oldest_id, complete, updated_at, synced_at) "
+        "SELECT channel_id, guild_id, MAX(message_id), MIN(message_id), 1, ?, ? "
+        "FROM messages WHERE channel_id = ? HAVING COUNT(*) > 0",
+        [(now_ms, now_ms, ch.id) for ch in gen.channels])
+    elapsed = time.perf_counter() - start
+    print(f"  built {path}: {rows:,} rows in {elapsed:.1f}s "
+          f"({rows / elapsed:,.0f}/s)", flush=True)
+    results = [Result("bulk load", [elapsed], rows, None)]
+    if args.archive:
+        # everything but the last ARCHIVE_AFTER_MONTHS moves to month files
+        start = time.perf_counter()
+        await core.maintain()
+        elapsed = time.perf_counter() - start
+        print(f"  {core.archive.summary()} in {elapsed:.1f}s", flush=True)
+        results.append(Result("archive", [elapsed], rows, None))
+    with open(stem + ".json", "w") as f:
+        json.dump(meta, f)
+    return results
+
+
+async def run_size(args, rows):
+    print(f"\n== {rows:,} rows ==", flush=True)
+    end = datetime.now(core.LOCAL_TZ).replace(hour=0, minute=0, second=0,
+                                             microsecond=0)
+    gen = SyntheticChat(args.seed, args.channels, args.authors, args.days,
+                        args.attachment_rate, end_ms=int(end.timestamp() * 1000))
+    results = await open_database(args, rows, gen)
+    # live since the checkpoints were written: queries plan no fetches
+    core.LIVE_SINCE = (await core.db.fetchone(
+        "SELECT MIN(synced_at) FROM index_checkpoints"))[0]
+    guild, channel = gen.guild, gen.channels[0]
+    author = gen.authors[0]
+    ctx = FakeContext(guild, channel, author)
+    day = (end - timedelta(days=max(1, args.days // 2))).strftime("%d-%m-%Y")
+    keyword = gen.keywords[0]
+    only = set(args.only.split(",")) if args.only else None
+
+    def want(name):
+        return only is None or name.split()[0] in only
+
+    async def cold_find():
+        finder.SEARCH_SESSIONS.clear()
+
+    benches = [
+        ("find keyword", lambda: finder_cog.find(ctx, keyword), cold_find),
+        ("find author", lambda: finder_cog.find(ctx, f"<@{author.id}>"), cold_find),
+        ("find cached", lambda: finder_cog.find(ctx, keyword), None),
+        ("find next", lambda: finder_cog.find(ctx, "next"), None),
+        ("find date", lambda: finder_cog.find(ctx, day), None),
+        ("find export", lambda: finder_cog.find(ctx, day, "--jsonl", "--gz"), None),
+        ("stats", lambda: finder_cog.stats(ctx), None),
+        ("stats 30d", lambda: finder_cog.stats(ctx, "30d"), None),
+        ("summary", lambda: finder_cog.summary(ctx, day), None),
+    ]
+    for name, fn, setup in benches:
+        if want(name):
+            results.append(await measure(name, fn, args.repeat, setup=setup))
+
+    if want("summarypdf"):
+        async def clear_pdf_cache():
+            shutil.rmtree(pdf.PDF_CACHE_DIR, ignore_errors=True)
+        pdf.PDF_CACHE_DIR = os.path.join(args.data_dir, "pdf_cache")
+        results.append(await measure(
+            "summarypdf", lambda: pdf_cog.summarypdf(ctx, day, channel.mention),
+            max(1, args.repeat // 2), setup=clear_pdf_cache))
+        results.append(await measure(
+            "summarypdf cached",
+            lambda: pdf_cog.summarypdf(ctx, day, channel.mention), args.repeat))
+
+    if want("activity") and importlib.util.find_spec("numpy"):
+        async def cold_activity():
+            activity.FRAMES.clear()
+        results.append(await measure(
+            "activity load", lambda: activity_cog.activity(ctx, "heatmap", "--csv"),
+            max(1, args.repeat // 2), setup=cold_activity))
+        for mode in ("heatmap", "daily", "trend", "channels"):
+            results.append(await measure(
+                f"activity {mode}",
+                lambda mode=mode: activity_cog.activity(ctx, mode, "365d", "--csv"),
+                args.repeat))
+
+    if want("index"):
+        counter = iter(range(1, 1_000_000))
+
+        async def index_once():
+            # a channel the database has never seen, so every page is fetched
+            ch = FakeChannel(300_000 + next(counter), guild, "fresh",
+                             latency=args.latency_ms / 1000)
+            ch.messages = list(gen.messages(args.index_rows, channel=ch,
+                                            id_offset=ch.id))
+            # (a kept database has its checkpoint from an earlier run)
+            await core.db.execute(
+                "DELETE FROM index_checkpoints WHERE channel_id = ?", (ch.id, ))
+            await finder_cog.index(FakeContext(guild, ch, author), args.index_rows)
+        results.append(await measure("index", index_once, args.repeat,
+                                     items=args.index_rows))
+
+    if want("indexall"):
+        crawls = iter(range(1, 1_000_000))
+        limits = []
+
+        async def crawl_once():
+            # fresh channels sharing one bucket; the crawler has to back off
+            # from its CRAWL_CONCURRENCY to fit it
+            fresh = FakeGuild(guild.id, guild.name)
+            limiter = FakeRateLimit(args.rate_limit)
+            base = 400_000 + next(crawls) * 1000
+            # a kept database remembers these channels from an earlier run
+            await core.db.execute(
+                "DELETE FROM index_checkpoints WHERE channel_id BETWEEN ? AND ?",
+                (base, base + 999))
+            for i in range(args.crawl_channels):
+                ch = FakeChannel(base + i, fresh, f"crawl-{i}",
+                                 latency=args.latency_ms / 1000)
+                ch.limiter = limiter if args.rate_limit else None
+                ch.messages = list(gen.messages(
+                    args.index_rows // args.crawl_channels, channel=ch,
+                    id_offset=ch.id))
+                fresh.text_channels.append(ch)
+            crawler = finder.CRAWLS[fresh.id] = finder.GuildCrawler(fresh)
+            lowest = [crawler.concurrency]
+
+            def note(channel_id, retry_after):
+                lowest.append(crawler.concurrency)
+            core.RATE_LIMIT_LISTENERS.append(note)
+            try:
+                await crawler.run()
+            finally:
+                finder.CRAWLS.pop(fresh.id, None)
+                core.RATE_LIMIT_LISTENERS.remove(note)
+            limits.append((limiter.hits, crawler.rate_limited, min(lowest)))
+        results.append(await measure("indexall", crawl_once, args.repeat,
+                                     items=args.index_rows))
+        hits, seen, lowest = limits[-1]
+        print(f"    last crawl: {hits} 429s, {seen} seen by the crawler, "
+              f"concurrency down to {lowest}/{finder.CRAWL_CONCURRENCY}")
+
+    if want("on_message"):
+        hours = iter(range(1, 1_000_000))
+
+        async def ingest_once():
+            # new messages, an hour's worth past the generated range per run;
+            # command dispatch needs a logged-in client, so only the logging
+            # path of on_message is measured
+            core.ingest.start()
+            for m in gen.messages(args.live_rows,
+                                  start_ms=gen.end_ms + next(hours) * 3_600_000,
+                                  span_ms=3_600_000):
+                await core.on_message(m)
+            await core.ingest.stop()
+        results.append(await measure("on_message", ingest_once, args.repeat,
+                                     items=args.live_rows))
+    return results
+
+
+def compare(report, baseline, tolerance, min_delta_ms):
+    """Benchmarks whose p50 got more than `tolerance` slower (and by at least
+    `min_delta_ms`, so sub-millisecond noise doesn't count)."""
+    regressions = []
+    for size, benches in report["sizes"].items():
+        for name, now in benches.items():
+            then = baseline.get("sizes", {}).get(size, {}).get(name)
+            if then and then["p50_ms"] > 0 and name != "bulk load":
+                ratio = now["p50_ms"] / then["p50_ms"]
+                if (ratio > 1 + tolerance
+                        and now["p50_ms"] - then["p50_ms"] >= min_delta_ms):
+                    regressions.append(
+                        f"{size} {name}: {then['p50_ms']:.1f}ms -> "
+                        f"{now['p50_ms']:.1f}ms (+{(ratio - 1) * 100:.0f}%)")
+    return regressions
+
+
+async def main(args):
+    global core, finder, pdf, activity, finder_cog, pdf_cog, activity_cog
+    os.environ.setdefault("DB_PATH", os.path.join(args.data_dir, "unused.db"))
+    import core as core_module
+    core = core_module
+    # loaded the way setup_hook does, minus the gateway
+    for name in ("cogs.finder", "cogs.pdf", "cogs.activity"):
+        await core.bot.load_extension(name)
+    import cogs.activity
+    import cogs.finder
+    import cogs.pdf
+    finder, pdf, activity = cogs.finder, cogs.pdf, cogs.activity
+    finder_cog = core.bot.get_cog("Finder")
+    pdf_cog = core.bot.get_cog("SummaryPDF")
+    activity_cog = core.bot.get_cog("Activity")
+    # gateway stand-in: commands read core.latency, nothing connects
+    core.bot.ws = types.SimpleNamespace(latency=0.0)
+    core.bot.process_commands = lambda message: asyncio.sleep(0)
+    core.db.close()
+    use_database(None, None)
+    report = {"started": datetime.now().isoformat(timespec="seconds"),
+              "python": sys.version.split()[0], "seed": args.seed, "sizes": {}}
+    try:
+        for size in args.sizes.split(","):
+            rows = parse_size(size)
+            results = await run_size(args, rows)
+            report["sizes"][size] = {r.name: r.as_dict() for r in results}
+    finally:
+        if core.db is not None:
+            await asyncio.to_thread(core.db.close)
+        if pdf.pdf_pool is not None:
+            pdf.pdf_pool.shutdown()
+    if resource is not None:
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        report["max_rss_mb"] = maxrss / (1048576 if sys.platform == "darwin" else 1024)
+        print(f"\nPeak RSS: {report['max_rss_mb']:.0f}MB")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance,
+                                  args.min_delta_ms)
+        for line in regressions:
+            print("REGRESSION", line)
+        return 1 if regressions else 0
+    return 0
+
+
+core = finder = pdf = activity = None
+finder_cog = pdf_cog = activity_cog = None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", default="10k",
+                        help="comma-separated row counts, e.g. 10k,1M,10M")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--channels", type=int, default=20)
+    parser.add_argument("--authors", type=int, default=500)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--attachment-rate", type=float, default=0.05)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=20,
+                        help="fake API latency per history page")
+    parser.add_argument("--index-rows", type=int, default=2000)
+    parser.add_argument("--crawl-channels", type=int, default=8,
+                        help="channels in the indexall crawl")
+    parser.add_argument("--rate-limit", type=float, default=10,
+                        help="history pages per second the fake API allows "
+                        "during indexall (0 = unlimited)")
+    parser.add_argument("--live-rows", type=int, default=5000)
+    parser.add_argument("--only", help="comma-separated benchmark names "
+                        "(find, stats, summary, summarypdf, activity, index, "
+                        "indexall, on_message)")
+    parser.add_argument("--data-dir", default="bench_data")
+    parser.add_argument("--archive", action="store_true",
+                        help="archive cold months first, so queries also "
+                        "read the compressed month files")
+    parser.add_argument("--fresh", action="store_true",
+                        help="rebuild databases even if a matching one is kept")
+    parser.add_argument("--json", help="write the report here")
+    parser.add_argument("--baseline", help="report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed p50 slowdown before failing (0.25 = 25%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="ignore slowdowns smaller than this")
+    sys.exit(asyncio.run(main(parser.parse_args())))
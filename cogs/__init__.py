@@ -0,0 +1 @@
+"""Bot extensions, loaded from core.EXTENSIONS."""
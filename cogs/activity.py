@@ -0,0 +1,448 @@
+"""`!activity`: heatmaps, rolling activity and per-channel trends computed
+with NumPy over cached columnar extracts of each guild's messages.
+Loaded by core.py as the `cogs.activity` extension."""
+import io
+import os
+import csv
+import time
+import asyncio
+import itertools
+import importlib.util
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timezone
+
+import discord
+from discord.ext import commands
+
+import core
+from core import archive, HELP_SECTIONS, detect_channel, from_ms, timed
+
+HELP = """📈 **Activity**
+!activity [heatmap|daily|trend|channels] [7d|30d|90d|365d|all] [#channel] [@user] [--csv|--png]"""
+
+
+# ---------- Activity ----------
+ACTIVITY_CACHE_SIZE = int(os.getenv("ACTIVITY_CACHE_SIZE", "8"))  # guilds kept in memory
+ACTIVITY_MODES = ("heatmap", "daily", "trend", "channels")
+ACTIVITY_WINDOWS = {"7d": 7, "30d": 30, "90d": 90, "365d": 365, "all": None}
+ACTIVITY_TOP_CHANNELS = 8
+ROLLING_DAYS = 7
+HOUR_MS = 3_600_000
+DAY_MS = 24 * HOUR_MS
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+FRAMES = OrderedDict()  # guild_id -> ActivityFrame, most recent last
+USAGE = ("⚠️ Usage: `!activity [heatmap|daily|trend|channels] [7d|30d|90d|365d|all]"
+         " [#channel] [@user] [--csv|--png]`")
+
+# NumPy (and matplotlib for PNGs) are imported on first use, like yt_dlp and
+# reportlab, so they cost nothing until someone runs !activity
+
+
+def extract_activity(c, guild_id, after_id=None):
+    """Runs on a reader thread: the guild's rollup total and an (n, 4) int64
+    array of (message_id, ts, author_id, channel_id), read in one snapshot.
+    Only rows past `after_id` (hot table) unless it is None (every
+    partition)."""
+    import numpy as np
+    sql = ("SELECT message_id, ts, COALESCE(author_id, 0), COALESCE(channel_id, 0) "
+           "FROM messages WHERE guild_id = ?")
+    c.execute("BEGIN")
+    try:
+        total = c.execute(
+            "SELECT COALESCE(SUM(count), 0) FROM stats_channels WHERE guild_id = ?",
+            (guild_id, )).fetchone()[0]
+        if after_id is None:
+            cursors = [conn.execute(sql, (guild_id, ))
+                       for conn, _ in archive.partitions(c)]
+        else:
+            # `+guild_id` keeps the planner on the rowid range: only new rows
+            cursors = [c.execute(sql.replace("guild_id = ?", "+guild_id = ?") +
+                                 " AND message_id > ?", (guild_id, after_id))]
+        # straight from the cursors into one array, no list of row tuples
+        values = np.fromiter(itertools.chain.from_iterable(
+            itertools.chain.from_iterable(cursors)), dtype=np.int64)
+    finally:
+        c.execute("COMMIT")
+    return total, values.reshape(-1, 4)
+
+
+def local_ms(ts):
+    """Epoch ms -> LOCAL_TZ wall-clock ms, one utcoffset() per distinct UTC
+    hour rather than per message."""
+    import numpy as np
+    hours, inverse = np.unique(ts // HOUR_MS, return_inverse=True)
+    offsets = np.array(
+        [from_ms(int(h) * HOUR_MS).utcoffset().total_seconds() * 1000
+         for h in hours], dtype=np.int64)
+    return ts + offsets[inverse.reshape(-1)]
+
+
+def encode(ids, known, codes):
+    """int32 codes for `ids` against the sorted ID table `known`. New IDs
+    grow the table, so the existing `codes` are remapped too. Returns
+    (known, codes, new codes)."""
+    import numpy as np
+    merged = np.union1d(known, ids)
+    if len(merged) != len(known):
+        codes = np.searchsorted(merged, known).astype(np.int32)[codes]
+    return merged, codes, np.searchsorted(merged, ids).astype(np.int32)
+
+
+# One immutable snapshot of a frame's columns: LOCAL_TZ wall-clock ms plus
+# int32 author and channel codes (16 bytes a message), the code -> Discord ID
+# tables and the newest message_id seen. Refreshes publish a new one in a
+# single assignment, so a compute running in a worker thread keeps reading
+# a consistent set.
+Columns = namedtuple("Columns", "local author channel author_ids channel_ids max_id")
+
+
+def empty_columns():
+    import numpy as np
+    return Columns(np.empty(0, np.int64), np.empty(0, np.int32),
+                   np.empty(0, np.int32), np.empty(0, np.int64),
+                   np.empty(0, np.int64), 0)
+
+
+def append_rows(cols, rows):
+    """A new Columns with `rows` from extract_activity appended; `cols` is
+    left untouched."""
+    import numpy as np
+    author_ids, author, new_authors = encode(rows[:, 2], cols.author_ids, cols.author)
+    channel_ids, channel, new_channels = encode(rows[:, 3], cols.channel_ids, cols.channel)
+    return Columns(
+        np.concatenate((cols.local, local_ms(rows[:, 1]))),
+        np.concatenate((author, new_authors)),
+        np.concatenate((channel, new_channels)),
+        author_ids, channel_ids,
+        max(cols.max_id, int(rows[:, 0].max())) if len(rows) else cols.max_id)
+
+
+def build_columns(rows):
+    import numpy as np
+    # a month being archived can briefly be read from both partitions
+    _, first = np.unique(rows[:, 0], return_index=True)
+    return append_rows(empty_columns(), rows[first])
+
+
+class ActivityFrame:
+    """One guild's messages as Columns.
+
+    Built once from every partition, then refreshed with only the rows past
+    the newest message_id seen. The stats rollup total is read in the same
+    snapshot; if it moved by anything other than those rows (older history
+    backfilled, legacy IDs attached), the frame is rebuilt instead.
+    """
+
+    def __init__(self, guild_id):
+        self.guild_id = guild_id
+        self.total = None
+        self.columns = empty_columns()
+        self.lock = asyncio.Lock()
+
+    async def refresh(self):
+        async with self.lock:
+            if self.total is not None:
+                total, rows = await core.db.read(
+                    extract_activity, self.guild_id, self.columns.max_id)
+                if total == self.total + len(rows):
+                    if len(rows):
+                        with timed("activity_seconds", step="append"):
+                            self.columns = await asyncio.to_thread(
+                                append_rows, self.columns, rows)
+                    self.total = total
+                    return
+            with timed("activity_seconds", step="load"):
+                total, rows = await core.db.read(extract_activity, self.guild_id)
+                self.columns = await asyncio.to_thread(build_columns, rows)
+            self.total = total
+
+
+def code(ids, value):
+    import numpy as np
+    i = np.searchsorted(ids, value)
+    return int(i) if i < len(ids) and ids[i] == value else -1
+
+
+def select(cols, days=None, channel_id=None, author_id=None):
+    """Matching (local ms, channel codes) plus the window's first and last
+    day numbers (LOCAL_TZ days since 1970-01-01)."""
+    import numpy as np
+    local = cols.local
+    now = int(time.time() * 1000)
+    today = (now + int(from_ms(now).utcoffset().total_seconds() * 1000)) // DAY_MS
+    mask = np.ones(len(local), dtype=bool)
+    if days:
+        first = today - days + 1
+        mask &= local >= first * DAY_MS
+    else:
+        first = int(local.min()) // DAY_MS if len(local) else today
+    if channel_id is not None:
+        mask &= cols.channel == code(cols.channel_ids, channel_id)
+    if author_id is not None:
+        mask &= cols.author == code(cols.author_ids, author_id)
+    return local[mask], cols.channel[mask], first, today
+
+
+async def get_frame(guild_id):
+    frame = FRAMES.get(guild_id)
+    if frame is None:
+        frame = FRAMES[guild_id] = ActivityFrame(guild_id)
+    FRAMES.move_to_end(guild_id)
+    while len(FRAMES) > ACTIVITY_CACHE_SIZE:
+        FRAMES.popitem(last=False)
+    await frame.refresh()
+    return frame
+
+
+def heatmap(local):
+    """7x24 message counts, Monday first, in LOCAL_TZ."""
+    import numpy as np
+    hours = local // HOUR_MS
+    weekday = (hours // 24 + 3) % 7  # 1970-01-01 was a Thursday
+    return np.bincount(weekday * 24 + hours % 24, minlength=168).reshape(7, 24)
+
+
+def daily(local, first, last):
+    """Messages per day over [first, last] and their trailing rolling mean."""
+    import numpy as np
+    counts = np.bincount(local // DAY_MS - first, minlength=last - first + 1)
+    sums = np.concatenate(([0], np.cumsum(counts)))
+    rolling = np.full(len(counts), np.nan)
+    if len(counts) >= ROLLING_DAYS:
+        rolling[ROLLING_DAYS - 1:] = (
+            sums[ROLLING_DAYS:] - sums[:-ROLLING_DAYS]) / ROLLING_DAYS
+    return counts, rolling
+
+
+def channel_trends(local, channel, first, last, channels, top=ACTIVITY_TOP_CHANNELS):
+    """Weekly counts of the busiest channels, as (channel codes, weeks x
+    channels matrix, least-squares slope of each column, i.e. how many
+    messages a week it gains or loses per week). Weeks end on `last`, so
+    only the oldest one can be partial."""
+    import numpy as np
+    totals = np.bincount(channel, minlength=channels)
+    order = np.argsort(totals)[::-1][:top]
+    order = order[totals[order] > 0]
+    weeks = (last - first) // 7 + 1
+    rank = np.full(channels, -1)
+    rank[order] = np.arange(len(order))
+    r = rank[channel]
+    keep = r >= 0
+    week = weeks - 1 - (last - local[keep] // DAY_MS) // 7
+    weekly = np.bincount(week * len(order) + r[keep],
+                         minlength=weeks * len(order)).reshape(weeks, len(order))
+    if weeks > 1 and len(order):
+        slopes = np.polyfit(np.arange(weeks), weekly, 1)[0]
+    else:
+        slopes = np.zeros(len(order))
+    return order, weekly, slopes
+
+
+def day_label(day):
+    return datetime.fromtimestamp(day * 86400, timezone.utc).strftime("%d-%m-%Y")
+
+
+def activity_csv(mode, data):
+    text = io.StringIO()
+    w = csv.writer(text)
+    if mode == "heatmap":
+        w.writerow(["weekday"] + [f"{h:02d}" for h in range(24)])
+        for name, row in zip(WEEKDAYS, data["grid"]):
+            w.writerow([name] + row.tolist())
+    elif mode == "daily":
+        w.writerow(["date", "messages"])
+        for i, n in enumerate(data["counts"]):
+            w.writerow([day_label(data["first"] + i), int(n)])
+    elif mode == "trend":
+        w.writerow(["date", "messages", f"rolling_{ROLLING_DAYS}d"])
+        for i, (n, avg) in enumerate(zip(data["counts"], data["rolling"])):
+            w.writerow([day_label(data["first"] + i), int(n),
+                        "" if avg != avg else round(float(avg), 2)])
+    else:
+        w.writerow(["week_ending"] + data["names"])
+        weeks = len(data["weekly"])
+        for i, row in enumerate(data["weekly"]):
+            w.writerow([day_label(data["last"] - 7 * (weeks - 1 - i))] + row.tolist())
+    return io.BytesIO(text.getvalue().encode("utf-8"))
+
+
+def activity_png(mode, data, title):
+    """Rendered with the Figure API (no pyplot state), so it is safe to run
+    in a worker thread."""
+    import numpy as np
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(10, 4.5), dpi=100)
+    ax = fig.subplots()
+    if mode == "heatmap":
+        image = ax.imshow(data["grid"], aspect="auto", cmap="magma")
+        ax.set_yticks(range(7), WEEKDAYS)
+        ax.set_xticks(range(0, 24, 2), [f"{h:02d}" for h in range(0, 24, 2)])
+        ax.set_xlabel("hour")
+        fig.colorbar(image, ax=ax, label="messages")
+    elif mode in ("daily", "trend"):
+        x = np.arange(len(data["counts"]))
+        ax.bar(x, data["counts"], color="#8ab4f8", label="per day")
+        if mode == "trend":
+            ax.plot(x, data["rolling"], color="#d93025",
+                    label=f"{ROLLING_DAYS}-day average")
+            ax.legend()
+        ticks = x[::max(1, len(x) // 8)]
+        ax.set_xticks(ticks, [day_label(data["first"] + int(i)) for i in ticks])
+        ax.set_ylabel("messages / day")
+    else:
+        weeks = len(data["weekly"])
+        for i, name in enumerate(data["names"]):
+            ax.plot(range(weeks), data["weekly"][:, i], marker="o", label=name)
+        ticks = range(0, weeks, max(1, weeks // 8))
+        ax.set_xticks(ticks, [day_label(data["last"] - 7 * (weeks - 1 - i))
+                              for i in ticks])
+        ax.set_ylabel("messages / week")
+        ax.legend(fontsize="small")
+    ax.set_title(title)
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    buf.seek(0)
+    return buf
+
+
+def compute_activity(frame, mode, days, channel_id, author_id, names):
+    """Runs in a worker thread: the chart data plus the text summary lines."""
+    import numpy as np
+    cols = frame.columns  # one snapshot, however refreshes interleave
+    local, channel, first, last = select(cols, days, channel_id, author_id)
+    data = {"first": first, "last": last, "total": len(local)}
+    if mode == "heatmap":
+        grid = heatmap(local)
+        data["grid"] = grid
+        wd, hour = divmod(int(grid.argmax()), 24)
+        by_day, by_hour = grid.sum(axis=1), grid.sum(axis=0)
+        lines = [
+            f"Busiest slot: {WEEKDAYS[wd]} {hour:02d}:00 ({int(grid[wd, hour]):,})",
+            f"Busiest day: {WEEKDAYS[int(by_day.argmax())]} | "
+            f"Peak hour: {int(by_hour.argmax()):02d}:00 | "
+            f"Quietest hour: {int(by_hour.argmin()):02d}:00",
+        ]
+    elif mode == "daily":
+        counts, _ = daily(local, first, last)
+        data["counts"] = counts
+        busiest, quietest = int(counts.argmax()), int(counts.argmin())
+        lines = [
+            f"Active days: {int(np.count_nonzero(counts)):,}/{len(counts):,} | "
+            f"Median: {np.median(counts):.0f}/day",
+            f"Busiest: {day_label(first + busiest)} ({int(counts[busiest]):,}) | "
+            f"Quietest: {day_label(first + quietest)} ({int(counts[quietest]):,})",
+        ]
+    elif mode == "trend":
+        counts, rolling = daily(local, first, last)
+        data["counts"], data["rolling"] = counts, rolling
+        recent = int(counts[-7:].sum())
+        before = int(counts[-14:-7].sum())
+        change = f"{(recent - before) / before * 100:+.0f}%" if before else "n/a"
+        peak = int(counts.argmax())
+        lines = [
+            f"Average: {counts.mean():.1f}/day | Peak: {int(counts[peak]):,} on "
+            f"{day_label(first + peak)}",
+            f"Last 7 days: {recent:,} ({change} vs the 7 days before)",
+        ]
+    else:
+        order, weekly, slopes = channel_trends(local, channel, first, last,
+                                               len(cols.channel_ids))
+        data["names"] = [names(int(cols.channel_ids[c])) for c in order]
+        data["weekly"] = weekly
+        lines = []
+        for name, column, slope in zip(data["names"], weekly.T, slopes):
+            # flat unless it moves by 2% of its average week, week on week
+            change = slope / max(column.mean(), 1)
+            arrow = "📈" if change > 0.02 else "📉" if change < -0.02 else "➖"
+            lines.append(f"{arrow} {name}: {int(column.sum()):,} "
+                         f"(trend {slope:+.1f} msgs/week)")
+    return data, lines
+
+
+# ---------- Extension ----------
+class Activity(commands.Cog):
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def cog_load(self):
+        HELP_SECTIONS[__name__] = HELP
+
+    async def cog_unload(self):
+        HELP_SECTIONS.pop(__name__, None)
+        FRAMES.clear()
+
+    @commands.command()
+    async def activity(self, ctx, *args):
+        start_time = time.time()
+        tokens = list(args)
+        mode, window, fmt = "heatmap", "90d", None
+        for tok in tokens[:]:
+            low = tok.lower()
+            if low in ACTIVITY_MODES:
+                mode = low
+            elif low in ACTIVITY_WINDOWS:
+                window = low
+            elif low in ("--csv", "--png"):
+                fmt = low[2:]
+            else:
+                continue
+            tokens.remove(tok)
+        user_id = None
+        for tok in tokens[:]:
+            if tok.startswith("<@") and tok.endswith(">") and tok.strip("<@!>").isdigit():
+                user_id = int(tok.strip("<@!>"))
+                tokens.remove(tok)
+        channel = detect_channel(ctx, tokens) if any(
+            tok.startswith("<#") for tok in tokens) else None
+        if tokens:
+            await ctx.send(USAGE)
+            return
+        if fmt is None or fmt == "png":
+            if importlib.util.find_spec("matplotlib") is None:
+                if fmt == "png":
+                    await ctx.send("⚠️ PNG charts need matplotlib; sending CSV instead.")
+                fmt = "csv"
+            else:
+                fmt = "png"
+        try:
+            frame = await get_frame(ctx.guild.id)
+        except ImportError:
+            await ctx.send("⚠️ !activity needs NumPy installed on the bot host.")
+            return
+
+        def names(channel_id):
+            ch = ctx.guild.get_channel(channel_id)
+            return f"#{ch.name}" if ch else str(channel_id)
+
+        with timed("activity_seconds", step="compute"):
+            data, lines = await asyncio.to_thread(
+                compute_activity, frame, mode, ACTIVITY_WINDOWS[window],
+                channel.id if channel else None, user_id, names)
+        if not data["total"]:
+            await ctx.send("❌ No messages found for that selection.")
+            return
+        scope = ["all time" if window == "all" else f"last {window}"]
+        if user_id:
+            member = ctx.guild.get_member(user_id)
+            scope.append(member.display_name if member else str(user_id))
+        title = f"{mode.capitalize()} ({', '.join(scope)})"
+        if channel:
+            title = title[:-1] + f", {channel.mention})"
+        filename = f"activity_{mode}_{window}.{fmt}"
+        if fmt == "png":
+            chart_title = title.replace(channel.mention, names(channel.id)) if channel else title
+            with timed("activity_seconds", step="render"):
+                fp = await asyncio.to_thread(activity_png, mode, data, chart_title)
+        else:
+            fp = activity_csv(mode, data)
+        elapsed = time.time() - start_time
+        await ctx.send(
+            f"📈 **{title}**\nMessages: {data['total']:,}\n" + "\n".join(lines) +
+            f"\n⏱️ {elapsed:.2f}s",
+            file=discord.File(fp=fp, filename=filename))
+
+
+async def setup(bot):
+    await bot.add_cog(Activity(bot))
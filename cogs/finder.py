@@ -0,0 +1,802 @@
+"""Chat Finder commands: indexing, crawl, stats, search, attachments,
+topics and summaries. Loaded by core.py as the `cogs.finder` extension."""
+import os
+import io
+import csv
+import gzip
+import json
+import time
+import sqlite3
+import asyncio
+import tempfile
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import discord
+from discord.ext import commands
+
+import core
+from core import (
+    ingest, archive, ChannelIndexer, LOCAL_TZ, DEFAULT_CLASSIFIER,
+    TOPIC_CLASSIFIERS, HELP_SECTIONS, RATE_LIMIT_LISTENERS, detect_channel, format_duration,
+    from_ms, local_day_bounds, local_day_range, parse_date, plan_channel,
+    plan_guild, read_newest, save_topic_categories, search_query, snowflake_at)
+
+HELP = """📜 **Chat Finder**
+!index, !indexall [status|cancel]
+!find [--txt|--jsonl|--csv] [--gz], !find next|prev
+!ingeststats
+!stats [today|7d|30d] [#channel]
+!files, !videos, !images
+!summary <date> [#channel]
+!topics [set|remove|reset]"""
+
+
+# ---------- Guild crawl ----------
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "4"))
+CRAWL_PROGRESS_SECONDS = 10
+CRAWL_RETRY_SECONDS = 5
+CRAWLS = {}
+
+
+class GuildCrawler:
+    """Runs ChannelIndexer over every readable text channel and thread.
+
+    At most `concurrency` channels are crawled at once. A 429 on one of the
+    active channels halves that number, at most once per retry_after window
+    so one burst counts once, and every channel that finishes cleanly gives
+    one slot back. discord.py retries the shorter 429s itself (reported
+    through RATE_LIMIT_LISTENERS); longer ones raise, and the channel
+    resumes from its checkpoint after the wait.
+    """
+
+    def __init__(self, guild, max_concurrency=CRAWL_CONCURRENCY):
+        self.guild = guild
+        self.max_concurrency = max_concurrency
+        self.concurrency = max_concurrency
+        self.channels = []
+        self.active = {}
+        self.done = []
+        self.failed = []
+        self.fetched = 0
+        self.inserted = 0
+        self.rate_limited = 0
+        self.backoff_until = 0.0
+        self.started = None
+        self.task = None
+        self._running = 0
+        self._slots = asyncio.Condition()
+
+    def readable_channels(self):
+        me = self.guild.me
+        channels = list(self.guild.text_channels) + list(self.guild.threads)
+        return [
+            ch for ch in channels
+            if ch.permissions_for(me).read_message_history
+        ]
+
+    async def _acquire(self):
+        async with self._slots:
+            await self._slots.wait_for(
+                lambda: self._running < self.concurrency)
+            self._running += 1
+
+    async def _release(self):
+        async with self._slots:
+            self._running -= 1
+            self._slots.notify_all()
+
+    def throttle(self, retry_after):
+        self.rate_limited += 1
+        now = time.monotonic()
+        if now >= self.backoff_until:
+            self.concurrency = max(1, self.concurrency // 2)
+            self.backoff_until = now + retry_after
+
+    async def _crawl_channel(self, channel):
+        await self._acquire()
+        try:
+            while True:
+                indexer = ChannelIndexer(channel)
+                self.active[channel.id] = (channel, indexer, time.monotonic())
+                try:
+                    await indexer.run(None)
+                    break
+                except (discord.RateLimited, discord.HTTPException) as e:
+                    if getattr(e, "status", 429) != 429:
+                        raise
+                    # already counted by crawl_rate_limited from the log
+                    self.fetched += indexer.fetched
+                    self.inserted += indexer.inserted
+                    await asyncio.sleep(
+                        getattr(e, "retry_after", None) or CRAWL_RETRY_SECONDS)
+            self.fetched += indexer.fetched
+            self.inserted += indexer.inserted
+            self.done.append(channel)
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+        except discord.HTTPException as e:
+            self.failed.append((channel, str(e)))
+        finally:
+            self.active.pop(channel.id, None)
+            await self._release()
+
+    async def run(self):
+        self.started = time.monotonic()
+        self.channels = self.readable_channels()
+        tasks = [asyncio.create_task(self._crawl_channel(ch))
+                 for ch in self.channels]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # one channel failing (or a cancel) stops the rest, and the crawl
+            # only counts as finished once every channel task has exited
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    @staticmethod
+    def eta(channel, indexer, elapsed):
+        # the backfill walks from backfill_from down toward the channel's own
+        # snowflake (its creation time); IDs are linear in time, so the
+        # distance covered is the fraction done
+        if not indexer.backfill_from or not indexer.oldest_id:
+            return "?"
+        span = indexer.backfill_from - channel.id
+        covered = indexer.backfill_from - indexer.oldest_id
+        if span <= 0 or covered <= 0:
+            return "?"
+        frac = min(covered / span, 1.0)
+        return format_duration(elapsed * (1 - frac) / frac)
+
+    def progress(self):
+        now = time.monotonic()
+        elapsed = max(now - self.started, 1e-6)
+        fetched = self.fetched + sum(
+            indexer.fetched for _, indexer, _ in self.active.values())
+        text = (
+            f"🕸️ **Indexing {self.guild.name}**: "
+            f"{len(self.done) + len(self.failed)}/{len(self.channels)} channels, "
+            f"{fetched} messages, {fetched / elapsed:.0f} msg/s, "
+            f"concurrency {self.concurrency}, rate limits {self.rate_limited}\n"
+        )
+        for channel, indexer, started in self.active.values():
+            ch_elapsed = max(now - started, 1e-6)
+            text += (
+                f"- {channel.mention}: {indexer.fetched} msgs, "
+                f"{indexer.fetched / ch_elapsed:.0f}/s, "
+                f"ETA {self.eta(channel, indexer, ch_elapsed)}\n")
+        return text[:1900]
+
+
+# ---------- Stats ----------
+STATS_WINDOWS = {
+    "today": (0, "today"),
+    "7d": (6, "last 7 days"),
+    "30d": (29, "last 30 days"),
+}
+
+
+async def read_stats(guild_id, window=None, channel=None):
+    """Total and top-5 authors from the rollup tables; never scans messages."""
+    if window is None:
+        if channel:
+            row = await core.db.fetchone(
+                "SELECT count FROM stats_channels WHERE guild_id = ? AND channel_id = ?",
+                (guild_id, channel.id))
+            top = await core.db.fetchall(
+                "SELECT a.author, s.count FROM stats_channel_authors s "
+                "LEFT JOIN stats_authors a ON a.guild_id = s.guild_id AND a.author_id = s.author_id "
+                "WHERE s.guild_id = ? AND s.channel_id = ? ORDER BY s.count DESC LIMIT 5",
+                (guild_id, channel.id))
+        else:
+            row = await core.db.fetchone(
+                "SELECT SUM(count) FROM stats_channels WHERE guild_id = ?",
+                (guild_id, ))
+            top = await core.db.fetchall(
+                "SELECT author, count FROM stats_authors WHERE guild_id = ? ORDER BY count DESC LIMIT 5",
+                (guild_id, ))
+        return (row[0] if row and row[0] else 0), top
+    first_day = datetime.now(LOCAL_TZ).date() - timedelta(
+        days=STATS_WINDOWS[window][0])
+    where = "s.guild_id = ? AND s.day >= ?"
+    params = [guild_id, int(first_day.strftime("%Y%m%d"))]
+    if channel:
+        where += " AND s.channel_id = ?"
+        params.append(channel.id)
+    row = await core.db.fetchone(f"SELECT SUM(count) FROM stats_daily s WHERE {where}",
+                            params)
+    top = await core.db.fetchall(
+        "SELECT a.author, SUM(s.count) FROM stats_daily s "
+        "LEFT JOIN stats_authors a ON a.guild_id = s.guild_id AND a.author_id = s.author_id "
+        f"WHERE {where} GROUP BY s.author_id ORDER BY 2 DESC LIMIT 5", params)
+    return (row[0] or 0), top
+
+
+# ---------- Find ----------
+EXPORT_FORMATS = ("txt", "jsonl", "csv")
+EXPORT_SPOOL_BYTES = 1024 * 1024  # parts bigger than this spill to disk
+MAX_INLINE = 25
+MESSAGE_CHARS = 2000  # Discord's per-message content limit
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "5"))  # sessions per user
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "600"))  # seconds
+
+
+class ResultExporter:
+    """Streams search results into spooled temp files.
+
+    Rows are written as they come off the cursor in txt, jsonl or csv,
+    optionally gzip-compressed; a new part is started whenever the current
+    one reaches `max_bytes`, so memory stays flat and every part fits in
+    one Discord upload.
+    """
+
+    def __init__(self, basename, fmt="txt", compress=False,
+                 max_bytes=8 * 1024 * 1024):
+        self.basename = basename
+        self.fmt = fmt
+        self.compress = compress
+        # leave headroom for the gzip trailer and one more row
+        self.max_bytes = max_bytes - 64 * 1024
+        self.count = 0
+        self.parts = []
+        self._raw = None
+
+    def _open(self):
+        self._raw = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_BYTES)
+        self._gz = gzip.GzipFile(fileobj=self._raw, mode="wb") if self.compress else None
+        self._text = io.TextIOWrapper(self._gz or self._raw, encoding="utf-8",
+                                      newline="")
+        if self.fmt == "csv":
+            self._csv = csv.writer(self._text)
+            self._csv.writerow(["timestamp", "author", "content", "message_id"])
+
+    def _close_part(self):
+        self._text.flush()
+        self._text.detach()
+        if self._gz:
+            self._gz.close()
+        self._raw.seek(0)
+        self.parts.append(self._raw)
+        self._raw = None
+
+    def write(self, message_id, author, content, ts):
+        if self._raw is None:
+            self._open()
+        stamp = from_ms(ts)
+        if self.fmt == "jsonl":
+            self._text.write(json.dumps({
+                "message_id": message_id,
+                "timestamp": stamp.isoformat(),
+                "author": author,
+                "content": content,
+            }, ensure_ascii=False) + "\n")
+        elif self.fmt == "csv":
+            self._csv.writerow([stamp.strftime("%d-%m-%Y %H:%M"), author,
+                                content, message_id])
+        else:
+            self._text.write(
+                f"[{stamp.strftime('%d-%m-%Y %H:%M')}] {author}: {content}\n")
+        self.count += 1
+        self._text.flush()
+        if self._raw.tell() >= self.max_bytes:
+            self._close_part()
+
+    def finish(self):
+        if self._raw is not None:
+            self._close_part()
+        ext = self.fmt + (".gz" if self.compress else "")
+        if len(self.parts) == 1:
+            return [(self.parts[0], f"{self.basename}.{ext}")]
+        return [(part, f"{self.basename}_part{n}.{ext}")
+                for n, part in enumerate(self.parts, start=1)]
+
+
+def export_search(c, sql, params, exporter, limit, start=None, end=None):
+    """Runs on a reader thread: streams up to `limit` matching rows from the
+    partitions overlapping [start, end) into `exporter` and returns how
+    many were written.
+
+    A month being archived sits in both the hot table and its file until
+    the hot copy is deleted; only then are archive rows checked against
+    the hot table, a batch at a time, so memory stays flat."""
+    for conn, part in archive.partitions(c, start, end):
+        overlap = part is not None and c.execute(
+            "SELECT 1 FROM messages WHERE message_id >= ? AND message_id < ? LIMIT 1",
+            (snowflake_at(part.start_ts), snowflake_at(part.end_ts))).fetchone()
+        cur = conn.execute(sql, params)
+        while exporter.count < limit:
+            rows = cur.fetchmany(500)
+            if not rows:
+                break
+            if overlap:
+                ids = [row[0] for row in rows]
+                hot = {mid for mid, in c.execute(
+                    "SELECT message_id FROM messages WHERE message_id IN "
+                    f"({','.join('?' * len(ids))})", ids)}
+                rows = [row for row in rows if row[0] not in hot]
+            for row in rows[:limit - exporter.count]:
+                exporter.write(*row)
+    return exporter.count
+
+
+class SearchSession:
+    """One user's paged search: pages already fetched plus a keyset cursor
+    (ts, message_id) of the last row, so the next page is a single indexed
+    query that continues where the previous one stopped."""
+
+    def __init__(self, channel, query):
+        self.channel = channel
+        self.query = query  # (keyword, author_id, channel_id, limit)
+        self.pages = []
+        self.page = 0
+        self.cursor = None
+        self.exhausted = False
+        self.touched = time.monotonic()
+
+    @property
+    def fetched(self):
+        return sum(len(p) for p in self.pages)
+
+    async def load(self, index):
+        """Makes sure page `index` is cached; returns False past the end."""
+        while index >= len(self.pages):
+            if self.exhausted:
+                return False
+            keyword, author_id, channel_id, limit = self.query
+            size = min(MAX_INLINE, limit - self.fetched)
+            sql, params = search_query(keyword, author_id, channel_id, None,
+                                       size + 1, ranked=False,
+                                       before=self.cursor)
+            # older pages only need the partitions before the cursor
+            end = self.cursor[0] + 1 if self.cursor else None
+            rows = await core.db.read(read_newest, sql, params, size + 1, None, end)
+            if len(rows) <= size or self.fetched + size >= limit:
+                self.exhausted = True
+            rows = rows[:size]
+            if not rows:
+                return False
+            self.pages.append(rows)
+            self.cursor = (rows[-1][3], rows[-1][0])
+        return True
+
+
+# (guild_id, user_id) -> OrderedDict(query -> SearchSession), most recent last
+SEARCH_SESSIONS = {}
+
+
+def search_sessions(ctx):
+    # expire every user's stale sessions, not just the caller's, so users
+    # who never search again don't keep their pages around forever
+    now = time.monotonic()
+    for key, sessions in list(SEARCH_SESSIONS.items()):
+        for query in [q for q, s in sessions.items()
+                      if now - s.touched > SEARCH_CACHE_TTL]:
+            del sessions[query]
+        if not sessions:
+            del SEARCH_SESSIONS[key]
+    return SEARCH_SESSIONS.setdefault((ctx.guild.id, ctx.author.id),
+                                      OrderedDict())
+
+
+def fit_lines(lines, budget):
+    """Joins `lines` into at most `budget` characters, shortening only the
+    longest ones: short lines are kept whole and the room they leave is
+    shared evenly among the rest."""
+    room = budget - (len(lines) - 1)
+    cap = None
+    for i, n in enumerate(sorted(len(line) for line in lines)):
+        share = room // (len(lines) - i)
+        if n > share:
+            cap = max(share, 1)
+            break
+        room -= n
+    if cap is not None:
+        lines = [line if len(line) <= cap else line[:cap - 1] + "…"
+                 for line in lines]
+    return "\n".join(lines)
+
+
+async def send_search_page(ctx, session, started):
+    session.touched = time.monotonic()
+    rows = session.pages[session.page]
+    results = []
+    for _, author, content, ts in rows:
+        stamp = from_ms(ts).strftime("%d-%m-%Y %H:%M")
+        results.append(f"[{stamp}] {author}: {content}")
+    footer = ""
+    more = session.page + 1 < len(session.pages) or not session.exhausted
+    if session.page or more:
+        nav = [cmd for cmd, ok in (("`!find prev`", session.page > 0),
+                                   ("`!find next`", more)) if ok]
+        footer += (f"\n\n📄 Page {session.page + 1} in "
+                   f"{session.channel.mention} | " + " / ".join(nav))
+    elapsed = time.time() - started
+    latency_ms = round(ctx.bot.latency * 1000)
+    footer += f"\n⏱️ {elapsed:.2f}s | 🏓 {latency_ms}ms"
+    # long messages are cut so the whole page fits in one Discord message
+    await ctx.send(fit_lines(results, MESSAGE_CHARS - len(footer)) + footer)
+
+
+async def page_search(ctx, step):
+    started = time.time()
+    sessions = search_sessions(ctx)
+    if not sessions:
+        await ctx.send("⚠️ No active search. Run `!find <query>` first.")
+        return
+    session = next(reversed(sessions.values()))
+    target = session.page + step
+    if target < 0:
+        await ctx.send("⚠️ Already on the first page.")
+        return
+    try:
+        found = await session.load(target)
+    except sqlite3.Error as e:
+        print("FTS search error:", e)
+        found = False
+    if not found:
+        await ctx.send("📭 No more results.")
+        return
+    session.page = target
+    await send_search_page(ctx, session, started)
+
+
+# ---------- Attachments ----------
+def attachment_authors(c, sql, params, start, end):
+    """Runs on a reader thread: (ts, author, url) rows, with authors of
+    messages that moved to the archive looked up there."""
+    rows = c.execute(sql, params).fetchall()
+    missing = {mid for _, mid, author, _ in rows if author is None}
+    authors = {}
+    for conn, part in archive.partitions(c, start, end):
+        if part is None or not missing:
+            continue
+        ids = sorted(missing)
+        authors.update(
+            row for row in conn.execute(
+                "SELECT message_id, author FROM messages_z WHERE message_id BETWEEN ? AND ?",
+                (ids[0], ids[-1])) if row[0] in missing)
+        missing -= authors.keys()
+    return [(ts, author or authors.get(mid), url)
+            for ts, mid, author, url in rows]
+
+
+async def fetch_attachments(ctx, date_str, args, kind, label):
+    date_filter = parse_date(date_str)
+    if not date_filter:
+        await ctx.send("⚠️ Invalid date format. Use DD-MM-YYYY")
+        return
+    search_channel = detect_channel(ctx, list(args))
+    await plan_channel(search_channel, 5000, local_day_bounds(date_filter))
+    sql = ("SELECT a.ts, a.message_id, m.author, a.url FROM attachments a "
+           "LEFT JOIN messages m ON m.message_id = a.message_id "
+           "WHERE a.channel_id = ? AND a.day = ?")
+    params = [search_channel.id, int(date_filter.strftime("%Y%m%d"))]
+    if kind:
+        sql += " AND a.kind = ?"
+        params.append(kind)
+    results = []
+    for ts, author, url in await core.db.read(
+            attachment_authors, sql + " ORDER BY a.ts", params,
+            *local_day_range(date_filter)):
+        stamp = from_ms(ts).strftime("%d-%m-%Y %H:%M")
+        results.append(f"[{stamp}] {author}: {url}")
+    if not results:
+        await ctx.send(
+            f"❌ No {label} found on {date_filter} in {search_channel.mention}")
+        return
+    output = "\n".join(results)
+    file_buffer = io.BytesIO(output.encode("utf-8"))
+    file_buffer.seek(0)
+    filename = f"{label}_{date_filter}.txt"
+    await ctx.send(
+        content=
+        f"✅ Found **{len(results)}** {label} on {date_filter} in {search_channel.mention}.",
+        file=discord.File(fp=file_buffer, filename=filename))
+
+
+# ---------- Extension ----------
+def crawl_rate_limited(channel_id, retry_after):
+    # None: a global limit, which slows every crawl
+    for crawler in CRAWLS.values():
+        if channel_id is None or channel_id in crawler.active:
+            crawler.throttle(retry_after)
+
+
+class Finder(commands.Cog):
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def cog_load(self):
+        HELP_SECTIONS[__name__] = HELP
+        RATE_LIMIT_LISTENERS.append(crawl_rate_limited)
+
+    async def cog_unload(self):
+        HELP_SECTIONS.pop(__name__, None)
+        if crawl_rate_limited in RATE_LIMIT_LISTENERS:
+            RATE_LIMIT_LISTENERS.remove(crawl_rate_limited)
+        for crawler in list(CRAWLS.values()):
+            if crawler.task is not None:
+                crawler.task.cancel()
+
+    @commands.command()
+    async def index(self, ctx, limit: int = 1000):
+        indexer = await ChannelIndexer(ctx.channel).run(limit)
+        status = ("history fully indexed" if indexer.complete else
+                  "older history remains, run `!index` again to continue")
+        await ctx.send(
+            f"✅ Indexed {indexer.inserted} new messages into the database "
+            f"(fetched {indexer.fetched}; {status}).")
+
+    @commands.command()
+    async def indexall(self, ctx, action: str = None):
+        crawler = CRAWLS.get(ctx.guild.id)
+        if action == "cancel":
+            if crawler:
+                crawler.task.cancel()
+                await ctx.send("🛑 Cancelling crawl...")
+            else:
+                await ctx.send("⚠️ No crawl is running.")
+            return
+        if action == "status":
+            await ctx.send(crawler.progress() if crawler else "⚠️ No crawl is running.")
+            return
+        if crawler:
+            await ctx.send("⚠️ A crawl is already running. Use `!indexall status` or `!indexall cancel`.")
+            return
+        guild_id = ctx.guild.id
+        crawler = CRAWLS[guild_id] = GuildCrawler(ctx.guild)
+        crawler.task = asyncio.create_task(crawler.run())
+        # stays registered (and cancellable) until the crawl itself has ended,
+        # even if this command stops reporting on it
+        def unregister(_):
+            if CRAWLS.get(guild_id) is crawler:
+                del CRAWLS[guild_id]
+        crawler.task.add_done_callback(unregister)
+        status_msg = await ctx.send("🕸️ Starting guild crawl...")
+        while not crawler.task.done():
+            await asyncio.wait({crawler.task}, timeout=CRAWL_PROGRESS_SECONDS)
+            try:
+                await status_msg.edit(content=crawler.progress())
+            except discord.HTTPException as e:
+                print("Crawl progress update failed:", e)
+        if crawler.task.cancelled():
+            await ctx.send("🛑 Crawl cancelled. Run `!indexall` again to resume.")
+            return
+        if crawler.task.exception():
+            await ctx.send(f"⚠️ Crawl failed: {crawler.task.exception()}")
+            return
+        elapsed = time.monotonic() - crawler.started
+        text = (f"✅ Crawled {len(crawler.done)} channels in {format_duration(elapsed)}: "
+                f"{crawler.inserted} new messages indexed.")
+        if crawler.failed:
+            text += "\n⚠️ Skipped: " + ", ".join(ch.mention for ch, _ in crawler.failed)
+        await ctx.send(text)
+
+    @commands.command()
+    async def ingeststats(self, ctx):
+        m = ingest.metrics()
+        await ctx.send(
+            f"📥 **Ingest queue**\n"
+            f"Depth: {m['depth']}/{m['capacity']} (max {m['max_depth']})\n"
+            f"Enqueued: {m['enqueued']} | Written: {m['written']} in {m['batches']} batches\n"
+            f"Blocked puts: {m['blocked']} | Errors: {m['errors']}\n"
+            f"Last flush: {m['last_flush_ms']:.1f}ms")
+
+    @commands.command()
+    @commands.guild_only()
+    async def stats(self, ctx, *args):
+        tokens = list(args)
+        window = None
+        for tok in tokens[:]:
+            if tok.lower() in STATS_WINDOWS:
+                window = tok.lower()
+                tokens.remove(tok)
+        channel = detect_channel(ctx, tokens) if tokens else None
+        total_messages, top_authors = await read_stats(ctx.guild.id, window,
+                                                       channel)
+        scope = [STATS_WINDOWS[window][1]] if window else []
+        if channel:
+            scope.append(channel.mention)
+        title = f"📊 **Chat Stats** ({', '.join(scope)})" if scope else "📊 **Chat Stats**"
+        stats_msg = f"{title}\nTotal Messages: {total_messages}\n\n**Top 5 Active Users:**\n"
+        for author, count in top_authors:
+            stats_msg += f"- {author or 'unknown'}: {count}\n"
+        await ctx.send(stats_msg)
+
+    @commands.command()
+    @commands.guild_only()
+    async def find(self, ctx, *args):
+        if not args:
+            await ctx.send(
+                "⚠️ Usage: `!find <keyword/@user/#channel/DD-MM-YYYY> [limit] [--txt|--jsonl|--csv] [--gz]`"
+                " — then `!find next` / `!find prev` to page")
+            return
+        if len(args) == 1 and args[0].lower() in ("next", "prev"):
+            await page_search(ctx, 1 if args[0].lower() == "next" else -1)
+            return
+        tokens = list(args)
+        export_format = None
+        compress = False
+        for tok in tokens[:]:
+            if tok.startswith("--") and tok[2:] in EXPORT_FORMATS:
+                export_format = tok[2:]
+                tokens.remove(tok)
+            elif tok == "--gz":
+                compress = True
+                tokens.remove(tok)
+        limit = 1000
+        if tokens and tokens[-1].isdigit():
+            limit = int(tokens.pop())
+        search_channel = detect_channel(ctx, tokens)
+        user_filter = None
+        for tok in tokens[:]:
+            if tok.startswith("<@") and tok.endswith(">"):
+                try:
+                    uid = int(tok.strip("<@!>"))
+                    member = ctx.guild.get_member(uid)
+                    if member:
+                        user_filter = member
+                        tokens.remove(tok)
+                        break
+                except Exception:
+                    pass
+        date_filter = None
+        for i, tok in enumerate(tokens[:]):
+            dt = parse_date(tok)
+            if dt:
+                date_filter = dt
+                tokens.pop(i)
+                break
+        keyword = " ".join(tokens).strip() if tokens else None
+        if keyword == "":
+            keyword = None
+        start_time = time.time()
+        # plain searches are paged and cached per user; identical queries
+        # inside the TTL reuse the fetched pages without touching the API
+        if not (date_filter or export_format or compress):
+            query = (keyword, user_filter.id if user_filter else None,
+                     search_channel.id, limit)
+            sessions = search_sessions(ctx)
+            session = sessions.pop(query, None)
+            fresh = session is None
+            if fresh:
+                session = SearchSession(search_channel, query)
+            # stored before any await so a prune from another user's search
+            # can't drop this user's (still empty) entry underneath us
+            sessions[query] = session
+            while len(sessions) > SEARCH_CACHE_SIZE:
+                sessions.popitem(last=False)
+            if fresh:
+                await plan_channel(search_channel, limit, None)
+            session.page = 0
+            try:
+                found = await session.load(0)
+            except sqlite3.Error as e:
+                print("FTS search error:", e)
+                found = False
+            if not found:
+                del sessions[query]
+                elapsed = time.time() - start_time
+                latency_ms = round(self.bot.latency * 1000)
+                await ctx.send(
+                    f"❌ No messages found.\n⏱️ {elapsed:.2f}s | 🏓 {latency_ms}ms")
+                return
+            await send_search_page(ctx, session, start_time)
+            return
+        window = local_day_bounds(date_filter) if date_filter else None
+        await plan_channel(search_channel, limit, window)
+        sql, params = search_query(keyword,
+                                   user_filter.id if user_filter else None,
+                                   search_channel.id, date_filter, limit,
+                                   ranked=False)
+        name_part = date_filter.strftime("%d-%m-%Y") if date_filter else (
+            keyword or "results")
+        exporter = ResultExporter(
+            f"chatlog_{name_part}", export_format or "txt", compress,
+            getattr(ctx.guild, "filesize_limit", 8 * 1024 * 1024))
+        try:
+            found = await core.db.read(export_search, sql, params, exporter, limit,
+                                  *(local_day_range(date_filter) if date_filter else ()))
+        except sqlite3.Error as e:
+            print("FTS search error:", e)
+            found = 0
+        elapsed = time.time() - start_time
+        latency_ms = round(self.bot.latency * 1000)
+        if not found:
+            for fp, _ in exporter.finish():
+                fp.close()
+            await ctx.send(
+                f"❌ No messages found.\n⏱️ {elapsed:.2f}s | 🏓 {latency_ms}ms")
+            return
+        parts = exporter.finish()
+        # each part is sized to the upload limit, which applies per message
+        for i, (fp, filename) in enumerate(parts):
+            content = (
+                f"✅ Found **{exporter.count}** messages in {search_channel.mention}.\n"
+                f"⏱️ {elapsed:.2f}s | 🏓 {latency_ms}ms") if i == 0 else None
+            await ctx.send(content=content, file=discord.File(fp=fp, filename=filename))
+        for fp, _ in parts:
+            fp.close()
+
+    @commands.command()
+    async def files(self, ctx, date_str: str, *args):
+        await fetch_attachments(ctx, date_str, args, None, "files")
+
+    @commands.command()
+    async def videos(self, ctx, date_str: str, *args):
+        await fetch_attachments(ctx, date_str, args, "video", "videos")
+
+    @commands.command()
+    async def images(self, ctx, date_str: str, *args):
+        await fetch_attachments(ctx, date_str, args, "image", "images")
+
+    @commands.command()
+    async def topics(self, ctx, action: str = None, topic: str = None, *keywords):
+        current = TOPIC_CLASSIFIERS.get(ctx.guild.id, DEFAULT_CLASSIFIER).categories
+        if action in ("set", "remove", "reset"):
+            if not ctx.author.guild_permissions.manage_guild:
+                await ctx.send("⚠️ You need the Manage Server permission to change topics.")
+                return
+            if action == "reset":
+                categories = None
+            elif action == "set" and topic and keywords:
+                categories = {**current, topic: list(keywords)}
+            elif action == "remove" and topic in current:
+                categories = {k: v for k, v in current.items() if k != topic}
+            else:
+                await ctx.send(
+                    "⚠️ Usage: `!topics set \"<topic>\" <keywords...>`, "
+                    "`!topics remove \"<topic>\"` or `!topics reset`")
+                return
+            await core.db.write(save_topic_categories, ctx.guild.id, categories)
+            current = TOPIC_CLASSIFIERS.get(ctx.guild.id, DEFAULT_CLASSIFIER).categories
+        msg = "🏷️ **Summary topics**\n"
+        for name, words in current.items():
+            msg += f"- {name}: {', '.join(words)}\n"
+        await ctx.send(msg)
+
+    @commands.command()
+    @commands.guild_only()
+    async def summary(self, ctx, date_str: str, *args):
+        date_filter = parse_date(date_str)
+        if not date_filter:
+            await ctx.send("⚠️ Invalid date format! Use DD-MM-YYYY.")
+            return
+        channel_filter = None
+        if args:
+            ch = detect_channel(ctx, list(args))
+            if ch:
+                channel_filter = ch
+        window = local_day_bounds(date_filter)
+        if channel_filter:
+            await plan_channel(channel_filter, window=window)
+        else:
+            await plan_guild(ctx.guild, window)
+        # both counts are kept up to date at insert time; no message rescans
+        where = "guild_id = ? AND day = ?"
+        params = [ctx.guild.id, int(date_filter.strftime("%Y%m%d"))]
+        if channel_filter:
+            where += " AND channel_id = ?"
+            params.append(channel_filter.id)
+        total = (await core.db.fetchone(
+            f"SELECT SUM(count) FROM stats_daily WHERE {where}", params))[0]
+        if not total:
+            await ctx.send(
+                f"❌ No messages found for {date_filter} {f'in {channel_filter}' if channel_filter else ''}."
+            )
+            return
+        sorted_topics = await core.db.fetchall(
+            f"SELECT topic, SUM(count) FROM topic_counts WHERE {where} "
+            "GROUP BY topic HAVING SUM(count) > 0 ORDER BY 2 DESC LIMIT 3", params)
+        if not sorted_topics:
+            await ctx.send(f"📅 No major topics on {date_filter}.")
+            return
+        summary_text = f"📅 Summary for {date_filter}:\n"
+        for topic, count in sorted_topics:
+            summary_text += f"- {topic} ({count} mentions)\n"
+        await ctx.send(summary_text)
+
+
+async def setup(bot):
+    await bot.add_cog(Finder(bot))
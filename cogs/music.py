@@ -0,0 +1,783 @@
+"""Music commands: yt-dlp lookups, per-guild players, prefetch and the
+Opus audio cache. Loaded by core.py as the `cogs.music` extension."""
+import os
+import re
+import io
+import glob
+import time
+import asyncio
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import discord
+from discord import FFmpegOpusAudio
+from discord.ext import commands
+
+from core import GAUGE_PROVIDERS, HELP_SECTIONS, timed
+
+HELP = """🎵 **Music**
+!join, !leave
+!play <query or <url>>
+!skip, !pause, !resume
+!queue, !streams"""
+
+
+# ---------- Opus ----------
+def ensure_opus():
+    """Load libopus (best-effort) before the first voice connection."""
+    if discord.opus.is_loaded():
+        return
+    tried = []
+    for libname in ("libopus.so.0", "libopus.so", "libopus.dylib", "opus.dll",
+                    "libopus-0.dll"):
+        try:
+            discord.opus.load_opus(libname)
+            print(f"✅ Loaded opus from: {libname}")
+            return
+        except Exception as e:
+            tried.append((libname, str(e)))
+    print("⚠️ opus not loaded. Tried:", tried)
+    print(
+        "If voice fails, install system lib 'libopus' (apt) or run on host with opus available."
+    )
+
+
+# ---------- MUSIC SYSTEM ----------
+ydl_opts_general = {
+    # Opus-in-WebM can be sent to Discord without re-encoding
+    "format": "bestaudio[acodec=opus]/bestaudio/best",
+    "quiet": True,
+    "noplaylist": True,
+    "socket_timeout": 10
+}
+YTDL_WORKERS = int(os.getenv("YTDL_WORKERS", "4"))
+YTDL_TIMEOUT = float(os.getenv("YTDL_TIMEOUT", "20"))  # seconds per lookup
+YTDL_CACHE_SIZE = int(os.getenv("YTDL_CACHE_SIZE", "256"))
+# stream URLs carry their own expiry; this caps entries that don't
+YTDL_CACHE_TTL = int(os.getenv("YTDL_CACHE_TTL", str(4 * 3600)))
+ydl_opts_playlist = {
+    "quiet": True,
+    "extract_flat": "in_playlist",
+    "socket_timeout": 10
+}
+PLAYLIST_PAGE = int(os.getenv("PLAYLIST_PAGE", "50"))  # queued before playback starts
+PLAYLIST_MAX = int(os.getenv("PLAYLIST_MAX", "500"))
+PLAYLIST_LOADS = set()  # background page loads, kept referenced
+ytdl_pool = ThreadPoolExecutor(max_workers=YTDL_WORKERS,
+                               thread_name_prefix="ytdl")
+PREFETCH_AHEAD = int(os.getenv("PREFETCH_AHEAD", "2"))  # queued items to refresh
+PREFETCH_LEAD = float(os.getenv("PREFETCH_LEAD", "20"))  # seconds before track end
+PREFETCH_SOURCE = os.getenv("PREFETCH_SOURCE", "1") == "1"  # pre-spawn FFmpeg
+
+
+class TTLCache:
+    """Small LRU cache whose entries also expire after a per-entry TTL."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self._data.pop(key, None)
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, value, ttl):
+        if ttl <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+RESOLVE_CACHE = TTLCache(YTDL_CACHE_SIZE)
+RESOLVING = {}  # normalized query -> in-flight lookup task
+
+
+def normalize_query(query):
+    """Canonical yt-dlp query: URLs lose their fragment and get a lower-case
+    scheme/host, searches are case- and whitespace-folded."""
+    if re.match(r"https?://", query, re.I):
+        u = urlparse(query.strip())
+        return u._replace(scheme=u.scheme.lower(), netloc=u.netloc.lower(),
+                          fragment="").geturl()
+    if query.startswith("ytsearch:"):
+        query = query[len("ytsearch:"):]
+    return "ytsearch:" + " ".join(query.lower().split())
+
+
+def stream_expired(info):
+    # playlist entries are queued unresolved and have no URL yet
+    return not info.get("url") or stream_ttl(info["url"]) <= 0
+
+
+def stream_ttl(url):
+    """Seconds a resolved stream URL can be reused: until its `expire`
+    parameter (minus a margin), capped at YTDL_CACHE_TTL."""
+    ttl = YTDL_CACHE_TTL
+    m = re.search(r"[?&/]expire[=/](\d+)", url or "")
+    if m:
+        ttl = min(ttl, int(m.group(1)) - int(time.time()) - 300)
+    return ttl
+
+
+async def run_ytdl(fn, *args):
+    with timed("ytdl_seconds"):
+        return await asyncio.wait_for(
+            asyncio.get_running_loop().run_in_executor(ytdl_pool, fn, *args),
+            YTDL_TIMEOUT)
+
+
+async def resolve(query):
+    """yt-dlp lookup off the event loop, bounded by the ytdl pool and
+    YTDL_TIMEOUT; repeat lookups are served from RESOLVE_CACHE and
+    concurrent ones share a single extraction."""
+    key = normalize_query(query)
+    info = RESOLVE_CACHE.get(key)
+    if info is not None:
+        return info
+    task = RESOLVING.get(key)
+    if task is None:
+        async def lookup():
+            try:
+                info = await run_ytdl(_extract_info, key)
+                if info and info.get("url"):
+                    info["query"] = key
+                    RESOLVE_CACHE.put(key, info, stream_ttl(info["url"]))
+                return info
+            finally:
+                RESOLVING.pop(key, None)
+        task = RESOLVING[key] = asyncio.create_task(lookup())
+    return await asyncio.shield(task)
+
+
+FFMPEG_BEFORE_OPTIONS = "-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5"
+FFMPEG_BITRATE = int(os.getenv("FFMPEG_BITRATE", "128"))  # kbps when transcoding
+try:
+    CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+except (AttributeError, ValueError, OSError):
+    CLOCK_TICKS = None
+
+
+class TrackedOpusAudio(FFmpegOpusAudio):
+    """FFmpeg Opus source that counts what it hands to the voice client.
+
+    Opus input is copied straight through (`passthrough`); anything else is
+    encoded to Opus once inside FFmpeg, so Python never touches PCM either
+    way.
+    """
+
+    def __init__(self, url, passthrough, local=False):
+        super().__init__(url, codec="copy" if passthrough else None,
+                         bitrate=FFMPEG_BITRATE, executable="ffmpeg",
+                         before_options=None if local else FFMPEG_BEFORE_OPTIONS,
+                         options="-vn")
+        self.passthrough = passthrough
+        self.local = local
+        self.started = time.monotonic()
+        self.packets = 0
+        self.bytes = 0
+
+    def read(self):
+        packet = super().read()
+        self.packets += 1
+        self.bytes += len(packet)
+        return packet
+
+    def ffmpeg_cpu_seconds(self):
+        """User+system CPU of the FFmpeg child, from /proc where available."""
+        proc = getattr(self, "_process", None)
+        if proc is None or CLOCK_TICKS is None:
+            return None
+        try:
+            with open(f"/proc/{proc.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            return None
+        return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+    def stats(self):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        cpu = self.ffmpeg_cpu_seconds()
+        return {
+            "mode": "cache" if self.local else (
+                "copy" if self.passthrough else "transcode"),
+            "elapsed": elapsed,
+            "kbps": self.bytes * 8 / elapsed / 1000,
+            "packets": self.packets,
+            "cpu_pct": None if cpu is None else cpu / elapsed * 100,
+        }
+
+
+def open_source(info):
+    path = audio_cache.path_for(info.get("track_id"))
+    if path:
+        return TrackedOpusAudio(path, True, local=True)
+    return TrackedOpusAudio(info.get("url"), info.get("acodec") == "opus")
+
+
+AUDIO_CACHE_DIR = os.getenv("AUDIO_CACHE_DIR", "audio_cache")
+AUDIO_CACHE_MB = int(os.getenv("AUDIO_CACHE_MB", "0"))  # 0 disables the cache
+AUDIO_CACHE_MAX_SECONDS = int(os.getenv("AUDIO_CACHE_MAX_SECONDS", "900"))
+AUDIO_CACHE_FILLS = int(os.getenv("AUDIO_CACHE_FILLS", "2"))
+
+
+def track_key(extractor, video_id):
+    if not video_id:
+        return None
+    return re.sub(r"[^A-Za-z0-9_-]", "_", f"{extractor or 'x'}-{video_id}")
+
+
+class AudioCache:
+    """On-disk Opus files keyed by track, evicted least-recently-played
+    first once the directory goes over its byte budget.
+
+    A miss is filled in the background by a separate FFmpeg that writes the
+    stream (copied, or encoded once) to `<track>.opus`; later plays read the
+    local file instead of going back to the remote host.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.files = OrderedDict()  # track -> size, least recent first
+        self.total = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.fills = 0
+        self._filling = set()
+        self._fill_slots = None
+        self._tasks = set()
+        self._lock = threading.Lock()  # path_for also runs on prefetch threads
+        if self.enabled:
+            os.makedirs(root, exist_ok=True)
+            found = []
+            for path in glob.glob(os.path.join(root, "*.opus")):
+                st = os.stat(path)
+                found.append((st.st_mtime, os.path.basename(path)[:-5], st.st_size))
+            for _, track, size in sorted(found):
+                self.files[track] = size
+                self.total += size
+            self._evict()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _path(self, track):
+        return os.path.join(self.root, track + ".opus")
+
+    def path_for(self, track):
+        with self._lock:
+            if not track or track not in self.files:
+                return None
+            self.files.move_to_end(track)
+        path = self._path(track)
+        try:
+            os.utime(path)  # keeps the order across restarts
+        except OSError:
+            return None
+        return path
+
+    def played(self, info, source):
+        """Counts a play and starts filling the cache on a miss."""
+        if not self.enabled:
+            return
+        if getattr(source, "local", False):
+            self.hits += 1
+            return
+        self.misses += 1
+        track = info.get("track_id")
+        duration = info.get("duration") or 0
+        if (track and info.get("url") and track not in self._filling
+                and duration <= AUDIO_CACHE_MAX_SECONDS):
+            self._filling.add(track)
+            task = asyncio.create_task(self._fill(track, info))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _fill(self, track, info):
+        if self._fill_slots is None:
+            self._fill_slots = asyncio.Semaphore(AUDIO_CACHE_FILLS)
+        path = self._path(track)
+        tmp = path + ".part"
+        codec = (["-c:a", "copy"] if info.get("acodec") == "opus" else
+                 ["-c:a", "libopus", "-b:a", f"{FFMPEG_BITRATE}k"])
+        try:
+            async with self._fill_slots:
+                proc = await asyncio.create_subprocess_exec(
+                    "ffmpeg", "-nostdin", "-loglevel", "error",
+                    *FFMPEG_BEFORE_OPTIONS.split(), "-i", info["url"], "-vn",
+                    *codec, "-f", "opus", "-y", tmp,
+                    stdout=asyncio.subprocess.DEVNULL,
+                    stderr=asyncio.subprocess.DEVNULL)
+                if await proc.wait() != 0:
+                    raise OSError(f"ffmpeg exited with {proc.returncode}")
+            os.replace(tmp, path)
+            size = os.path.getsize(path)
+            with self._lock:
+                self.total += size - self.files.pop(track, 0)
+                self.files[track] = size
+            self.fills += 1
+            self._evict()
+        except Exception as e:
+            print("Audio cache fill error:", e)
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+        finally:
+            self._filling.discard(track)
+
+    def _evict(self):
+        while self.total > self.max_bytes and self.files:
+            with self._lock:
+                track, size = self.files.popitem(last=False)
+                self.total -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(track))
+            except OSError:
+                pass
+
+    def summary(self):
+        if not self.enabled:
+            return "💽 Audio cache: off"
+        return (f"💽 Audio cache: {len(self.files)} tracks, "
+                f"{self.total / 1048576:.1f}/{self.max_bytes / 1048576:.0f} MB | "
+                f"hits {self.hits}, misses {self.misses}, "
+                f"fills {self.fills}, evictions {self.evictions}")
+
+
+audio_cache = AudioCache(AUDIO_CACHE_DIR, AUDIO_CACHE_MB * 1024 * 1024)
+
+
+class GuildPlayer:
+    """Playback actor for one guild.
+
+    The queue is a deque and a single asyncio task per guild plays it out:
+    the voice client's `after` callback only sets an event from the audio
+    thread, and the task picks the next track on the loop. The task exits
+    when the queue runs dry and `enqueue` starts a new one, so idle guilds
+    cost nothing. `state` goes IDLE with no await after the last look at
+    the queue, so an item enqueued at any point either is seen by the
+    running task or starts a new one.
+    """
+
+    IDLE, TRANSITIONING, PLAYING, PAUSED = "idle", "transitioning", "playing", "paused"
+
+    def __init__(self, client, guild_id):
+        self.client = client
+        self.guild_id = guild_id
+        self.queue = deque()
+        self.text_channel = None
+        self.current = None
+        self.state = self.IDLE
+        self._finished = asyncio.Event()
+        self._task = None
+        self._lookahead = None
+        self._prefetching = False
+        self._notice = None
+
+    def enqueue(self, item, text_channel):
+        self.queue.append(item)
+        self.text_channel = text_channel
+        if self.state == self.IDLE:
+            self.state = self.TRANSITIONING
+            self._task = asyncio.create_task(self._run())
+
+    def stream_stats(self):
+        source = self.current.get("playing") if self.current else None
+        return source.stats() if source is not None else None
+
+    def pause(self, vc):
+        vc.pause()
+        self.state = self.PAUSED
+
+    def resume(self, vc):
+        vc.resume()
+        self.state = self.PLAYING
+
+    def _after(self, err):
+        # runs on the audio thread: hand control back to the loop, never block
+        if err:
+            print("Player error:", err)
+        self.client.loop.call_soon_threadsafe(self._finished.set)
+
+    async def _say(self, text):
+        try:
+            await self.text_channel.send(text)
+        except Exception:
+            pass
+
+    def _finish(self, text):
+        # no await here: the caller has just seen the queue empty (or
+        # cleared it), and from IDLE on enqueue starts a new task
+        self.current = None
+        self.state = self.IDLE
+        self._notice = asyncio.create_task(self._say(text))
+
+    async def _refresh(self, item):
+        """Re-resolves an item whose stream URL has (nearly) expired."""
+        info = item["info"]
+        if audio_cache.path_for(info.get("track_id")):
+            return
+        if info.get("query") and stream_expired(info):
+            discard_source(item)
+            item["info"] = await resolve(info["query"])
+
+    async def _prefetch(self, duration):
+        """Shortly before the current track ends, refresh the next
+        PREFETCH_AHEAD items and pre-spawn FFmpeg for the first one, so the
+        transition doesn't wait on yt-dlp or FFmpeg startup."""
+        if duration:
+            await asyncio.sleep(max(0, duration - PREFETCH_LEAD))
+        self._prefetching = True
+        for item in list(self.queue)[:PREFETCH_AHEAD]:
+            try:
+                await self._refresh(item)
+            except Exception as e:
+                print("Prefetch error:", e)
+        if PREFETCH_SOURCE and self.queue and "source" not in self.queue[0]:
+            item = self.queue[0]
+            try:
+                item["source"] = await asyncio.to_thread(open_source,
+                                                         item["info"])
+            except Exception as e:
+                print("Prefetch error:", e)
+
+    async def _run(self):
+        try:
+            while self.queue:
+                self.state = self.TRANSITIONING
+                item = self.queue.popleft()
+                guild = self.client.get_guild(self.guild_id)
+                vc = guild.voice_client if guild else None
+                if not vc:
+                    # nothing could play the rest either
+                    dropped = len(self.queue)
+                    for queued in [item] + list(self.queue):
+                        discard_source(queued)
+                    self.queue.clear()
+                    self._finish("⚠️ I am not connected to VC." + (
+                        f" Cleared {dropped} queued tracks." if dropped else ""))
+                    return
+                try:
+                    await self._refresh(item)
+                    info = item["info"]
+                    source = item.pop("source", None) or open_source(info)
+                    self._finished.clear()
+                    vc.play(source, after=self._after)
+                except Exception as e:
+                    discard_source(item)
+                    await self._say("⚠️ Failed to play song: " + str(e))
+                    continue
+                item["playing"] = source
+                audio_cache.played(info, source)
+                self.current = item
+                self.state = self.PLAYING
+                self._prefetching = False
+                self._lookahead = asyncio.create_task(
+                    self._prefetch(info.get("duration")))
+                await self._say(
+                    f"▶️ Now playing: **{info.get('title', 'Unknown')}** "
+                    f"(requested by {item.get('requester', 'unknown')})")
+                await self._finished.wait()
+                # a prefetch already under way is work the next track needs
+                if self._prefetching:
+                    await asyncio.gather(self._lookahead, return_exceptions=True)
+                self._lookahead.cancel()
+                self.current = None
+            self._finish("📭 Queue finished.")
+        finally:
+            if self._lookahead:
+                self._lookahead.cancel()
+            if self.state != self.IDLE:  # cancelled or failed
+                for item in self.queue:
+                    discard_source(item)
+                self.current = None
+                self.state = self.IDLE
+
+
+def discard_source(item):
+    source = item.pop("source", None)
+    if source is not None:
+        source.cleanup()
+
+
+PLAYERS = {}  # guild_id -> GuildPlayer
+
+
+def get_player(client, guild_id):
+    player = PLAYERS.get(guild_id)
+    if player is None:
+        player = PLAYERS[guild_id] = GuildPlayer(client, guild_id)
+    return player
+
+
+def _extract_info(query):
+    import yt_dlp  # heavy; first lookup pays for it, not startup
+    with yt_dlp.YoutubeDL(ydl_opts_general) as ydl:
+        info = ydl.extract_info(query, download=False)
+        if "entries" in info:
+            info = info["entries"][0]
+        stream_url = info.get("url")
+        if not stream_url:
+            formats = info.get("formats", [])
+            if formats:
+                stream_url = formats[-1].get("url")
+            acodec = None
+        else:
+            acodec = info.get("acodec")
+        return {"url": stream_url, "title": info.get("title", "Unknown"),
+                "duration": info.get("duration"), "acodec": acodec,
+                "track_id": track_key(info.get("extractor_key"), info.get("id"))}
+
+
+def is_playlist_url(query):
+    u = urlparse(query)
+    if "list=" in u.query and "v=" not in u.query:
+        return True
+    return bool(re.search(r"/(playlist|sets|album)(/|$)", u.path))
+
+
+def _extract_playlist(url, start, end):
+    """Flat extraction of entries start..end (1-based): titles and page
+    URLs only, nothing is resolved to a stream."""
+    import yt_dlp
+    opts = dict(ydl_opts_playlist, playliststart=start, playlistend=end)
+    with yt_dlp.YoutubeDL(opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+    entries = []
+    for e in info.get("entries") or []:
+        page = e and (e.get("url") or e.get("webpage_url"))
+        if page:
+            entries.append({"title": e.get("title") or "Unknown",
+                            "query": normalize_query(page),
+                            "duration": e.get("duration"),
+                            "track_id": track_key(e.get("ie_key"), e.get("id"))})
+    return info.get("title") or "playlist", entries
+
+
+async def load_playlist_rest(url, title, player, ctx):
+    """Queues the rest of a playlist one PLAYLIST_PAGE at a time, so each
+    lookup stays well inside YTDL_TIMEOUT and tracks become playable as
+    soon as their page arrives."""
+    queued, error = 0, None
+    for start in range(PLAYLIST_PAGE + 1, PLAYLIST_MAX + 1, PLAYLIST_PAGE):
+        if ctx.voice_client is None:
+            break  # left voice; nothing would play them
+        end = min(start + PLAYLIST_PAGE - 1, PLAYLIST_MAX)
+        try:
+            _, entries = await run_ytdl(_extract_playlist, url, start, end)
+        except Exception as e:
+            print("Playlist load error:", e)
+            error = "timed out" if isinstance(e, asyncio.TimeoutError) else str(e)
+            break
+        for info in entries:
+            player.enqueue({"info": info, "requester": str(ctx.author)},
+                           ctx.channel)
+        queued += len(entries)
+        if len(entries) < end - start + 1:
+            break
+    if error:
+        await ctx.send(f"⚠️ Queued {queued} more tracks from **{title}**, "
+                       f"then loading stopped: {error}")
+    elif queued:
+        await ctx.send(f"➕ Queued {queued} more tracks from **{title}**")
+
+
+# ---------- Extension ----------
+def player_gauges():
+    states = {}
+    for player in PLAYERS.values():
+        states[player.state] = states.get(player.state, 0) + 1
+    return {"voice_players": [({"state": state}, n)
+                              for state, n in states.items()]}
+
+
+class Music(commands.Cog):
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def cog_load(self):
+        HELP_SECTIONS[__name__] = HELP
+        GAUGE_PROVIDERS.append(player_gauges)
+
+    async def cog_unload(self):
+        HELP_SECTIONS.pop(__name__, None)
+        if player_gauges in GAUGE_PROVIDERS:
+            GAUGE_PROVIDERS.remove(player_gauges)
+        for task in list(PLAYLIST_LOADS) + list(audio_cache._tasks):
+            task.cancel()
+        for player in PLAYERS.values():
+            if player._task is not None:
+                player._task.cancel()
+        ytdl_pool.shutdown(wait=False, cancel_futures=True)
+
+    @commands.command()
+    async def join(self, ctx):
+        ensure_opus()
+        if ctx.author.voice:
+            channel = ctx.author.voice.channel
+            if ctx.voice_client is None:
+                await channel.connect()
+            else:
+                await ctx.voice_client.move_to(channel)
+            await ctx.send(f"✅ Joined {channel.name}")
+        else:
+            await ctx.send("⚠️ You need to join a voice channel first!")
+
+    @commands.command()
+    async def leave(self, ctx):
+        if ctx.voice_client:
+            await ctx.voice_client.disconnect()
+            await ctx.send("👋 Left the voice channel.")
+        else:
+            await ctx.send("⚠️ I'm not in a voice channel!")
+
+    @commands.command()
+    async def play(self, ctx, *, query: str):
+        if not query:
+            await ctx.send("⚠️ Usage: `!play <query or <url>>`")
+            return
+        if query.startswith("<") and query.endswith(">"):
+            query = query[1:-1].strip()
+        if re.match(r"https?://", query):
+            ytdl_query = query
+        else:
+            ytdl_query = f"ytsearch:{query}"
+        await ctx.trigger_typing()
+        playlist = ytdl_query == query and is_playlist_url(query)
+        try:
+            if playlist:
+                title, entries = await run_ytdl(_extract_playlist, query, 1,
+                                                min(PLAYLIST_PAGE, PLAYLIST_MAX))
+                if not entries:
+                    await ctx.send("⚠️ That playlist is empty.")
+                    return
+            else:
+                info = await resolve(ytdl_query)
+                if not info or not info.get("url"):
+                    await ctx.send("⚠️ Couldn't find audio for that query.")
+                    return
+        except asyncio.TimeoutError:
+            await ctx.send("⚠️ Timed out fetching info, try again.")
+            return
+        except Exception as e:
+            await ctx.send("⚠️ Error fetching info: " + str(e))
+            return
+        if not ctx.voice_client:
+            if ctx.author.voice:
+                ensure_opus()
+                try:
+                    await ctx.author.voice.channel.connect()
+                except Exception as e:
+                    await ctx.send("⚠️ Failed to connect to VC: " + str(e))
+                    return
+            else:
+                await ctx.send("⚠️ Join a voice channel first.")
+                return
+        player = get_player(self.bot, ctx.guild.id)
+        busy = player.state != GuildPlayer.IDLE
+        if playlist:
+            # entries stay unresolved until the player (or its lookahead)
+            # gets to them
+            for info in entries:
+                player.enqueue({"info": info, "requester": str(ctx.author)},
+                               ctx.channel)
+            await ctx.send(f"➕ Queued {len(entries)} tracks from **{title}**")
+            if len(entries) >= PLAYLIST_PAGE and PLAYLIST_MAX > PLAYLIST_PAGE:
+                task = asyncio.create_task(
+                    load_playlist_rest(query, title, player, ctx))
+                PLAYLIST_LOADS.add(task)
+                task.add_done_callback(PLAYLIST_LOADS.discard)
+            return
+        player.enqueue({"info": info, "requester": str(ctx.author)}, ctx.channel)
+        if busy:
+            await ctx.send(f"➕ Added to queue: **{info.get('title')}**")
+
+    @commands.command()
+    async def skip(self, ctx):
+        if ctx.voice_client and ctx.voice_client.is_playing():
+            ctx.voice_client.stop()
+            await ctx.send("⏭️ Skipped.")
+        else:
+            await ctx.send("⚠️ Nothing is playing.")
+
+    @commands.command()
+    async def pause(self, ctx):
+        if ctx.voice_client and ctx.voice_client.is_playing():
+            get_player(self.bot, ctx.guild.id).pause(ctx.voice_client)
+            await ctx.send("⏸️ Paused.")
+        else:
+            await ctx.send("⚠️ Nothing is playing.")
+
+    @commands.command()
+    async def resume(self, ctx):
+        if ctx.voice_client and ctx.voice_client.is_paused():
+            get_player(self.bot, ctx.guild.id).resume(ctx.voice_client)
+            await ctx.send("▶️ Resumed.")
+        else:
+            await ctx.send("⚠️ Nothing is paused.")
+
+    @commands.command(name="queue")
+    async def command_queue(self, ctx):
+        player = PLAYERS.get(ctx.guild.id)
+        q = player.queue if player else None
+        if not q:
+            await ctx.send("📭 Queue is empty.")
+            return
+        msg = "📜 Queue:\n"
+        for i, item in enumerate(q, start=1):
+            title = item.get("info", {}).get("title", "Unknown")
+            requester = item.get("requester", "unknown")
+            msg += f"{i}. {title} (requested by {requester})\n"
+        if len(msg) > 1900:
+            buf = io.BytesIO(msg.encode("utf-8"))
+            buf.seek(0)
+            await ctx.send(file=discord.File(fp=buf, filename="queue.txt"))
+        else:
+            await ctx.send(msg)
+
+    @commands.command()
+    async def streams(self, ctx):
+        lines, cpu = [], []
+        for player in PLAYERS.values():
+            st = player.stream_stats()
+            if not st:
+                continue
+            guild = self.bot.get_guild(player.guild_id)
+            load = "n/a" if st["cpu_pct"] is None else f"{st['cpu_pct']:.1f}%"
+            lines.append(f"{guild.name if guild else player.guild_id}: {st['mode']} | "
+                         f"{st['kbps']:.0f} kbps | FFmpeg CPU {load}")
+            if st["cpu_pct"] is not None:
+                cpu.append(st["cpu_pct"])
+        if not lines:
+            await ctx.send("📭 No active streams.\n" + audio_cache.summary())
+            return
+        msg = f"🎚️ **Streams** ({len(lines)})\n" + "\n".join(lines[:20])
+        if cpu:
+            avg = sum(cpu) / len(cpu)
+            per_core = f"~{100 / avg:.0f}" if avg > 0 else "n/a"
+            msg += f"\n\nAvg FFmpeg CPU/stream: {avg:.1f}% | Streams per core: {per_core}"
+        await ctx.send(msg + "\n" + audio_cache.summary())
+
+
+async def setup(bot):
+    await bot.add_cog(Music(bot))
@@ -0,0 +1,181 @@
+"""`!summarypdf`: day summaries rendered to PDF in a process pool.
+Loaded by core.py as the `cogs.pdf` extension."""
+import os
+import glob
+import json
+import time
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import discord
+from discord.ext import commands
+
+import core
+from core import (
+    archive, TIMEZONE_NAME, HELP_SECTIONS, detect_channel, local_day_bounds,
+    local_day_range, parse_date, plan_channel, plan_guild, timed)
+from workers import render_summary_pdfs
+
+HELP = """📄 **Summary PDF**
+!summarypdf <date> [#channel]"""
+
+
+# ---------- Summary PDF ----------
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", "pdf_cache")
+PDF_CACHE_MB = int(os.getenv("PDF_CACHE_MB", "200"))  # 0 = no limit
+PDF_CACHE_GRACE = 60  # seconds a just-served render is safe from eviction
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))
+PDF_ROWS_PER_FILE = 2000
+PDF_FILES_PER_MESSAGE = 10  # Discord's attachment limit
+PDF_LOCKS = {}
+pdf_pool = None
+
+
+def day_fingerprint(c, sql, params, start, end):
+    """Runs on a reader thread: (count, max message_id) across partitions."""
+    count, max_id = 0, None
+    for conn, _ in archive.partitions(c, start, end):
+        n, top = conn.execute(sql, params).fetchone()
+        count += n
+        if top is not None:
+            max_id = max(max_id or 0, top)
+    return count, max_id
+
+
+def trim_pdf_cache(max_bytes, keep):
+    """Deletes whole renders (a manifest and its parts), least recently
+    served first, until PDF_CACHE_DIR fits in `max_bytes`. Renders served in
+    the last PDF_CACHE_GRACE seconds may still be uploading and stay, as
+    does `keep`. Returns how many were deleted."""
+    entries, total = [], 0
+    for manifest in glob.glob(os.path.join(PDF_CACHE_DIR, "*.json")):
+        # parts without a manifest are a render in progress; not counted
+        parts = glob.glob(glob.escape(manifest[:-5]) + "_p*.pdf")
+        try:
+            size = os.path.getsize(manifest) + sum(map(os.path.getsize, parts))
+            entries.append((os.path.getmtime(manifest), manifest, parts, size))
+        except OSError:
+            continue
+        total += size
+    evicted = 0
+    cutoff = time.time() - PDF_CACHE_GRACE
+    for used, manifest, parts, size in sorted(entries):
+        if total <= max_bytes or used > cutoff:
+            break
+        if manifest == keep:
+            continue
+        for path in [manifest] + parts:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        total -= size
+        evicted += 1
+    return evicted
+
+
+def get_pdf_pool():
+    global pdf_pool
+    if pdf_pool is None:
+        # spawn, not fork: the parent has live DB threads and an event loop
+        pdf_pool = ProcessPoolExecutor(
+            max_workers=PDF_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"))
+    return pdf_pool
+
+
+async def summary_pdf_files(guild_id, channel, date_filter):
+    """Cached PDF parts for a day, rendering them first if needed.
+
+    The cache key includes the day's message count and newest message ID,
+    so the files are reused until that day actually changes.
+    """
+    start_ms, end_ms = local_day_range(date_filter)
+    if channel:
+        where, scope_id = "channel_id = ?", channel.id
+    else:
+        where, scope_id = "guild_id = ?", guild_id
+    where += " AND ts >= ? AND ts < ?"
+    params = (scope_id, start_ms, end_ms)
+    count, max_id = await core.db.read(
+        day_fingerprint,
+        f"SELECT COUNT(*), MAX(message_id) FROM messages WHERE {where}", params,
+        start_ms, end_ms)
+    if not count:
+        return []
+    scope = f"{guild_id}_{channel.id if channel else 'all'}_{date_filter}"
+    key = f"{scope}_{count}_{max_id}"
+    manifest = os.path.join(PDF_CACHE_DIR, key + ".json")
+    async with PDF_LOCKS.setdefault(scope, asyncio.Lock()):
+        if os.path.exists(manifest):
+            os.utime(manifest)  # least recently served is evicted first
+            with open(manifest) as f:
+                return json.load(f)
+        os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+        for old in glob.glob(os.path.join(PDF_CACHE_DIR, scope + "_*")):
+            os.remove(old)
+        loop = asyncio.get_running_loop()
+        with timed("pdf_render_seconds"):
+            paths = await loop.run_in_executor(
+                get_pdf_pool(), render_summary_pdfs, [os.path.abspath(core.DB_PATH)] +
+                [os.path.abspath(p.path) for p in archive.covering(start_ms, end_ms)],
+                f"SELECT message_id, author, content, ts FROM messages WHERE {where} "
+                "ORDER BY ts, message_id",
+                params, f"Chat Summary for {date_filter}", TIMEZONE_NAME,
+                os.path.join(PDF_CACHE_DIR, key), PDF_ROWS_PER_FILE)
+        with open(manifest, "w") as f:
+            json.dump(paths, f)
+        if PDF_CACHE_MB:
+            await asyncio.to_thread(trim_pdf_cache, PDF_CACHE_MB * 1048576, manifest)
+        return paths
+
+
+# ---------- Extension ----------
+class SummaryPDF(commands.Cog):
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def cog_load(self):
+        HELP_SECTIONS[__name__] = HELP
+
+    async def cog_unload(self):
+        global pdf_pool
+        HELP_SECTIONS.pop(__name__, None)
+        if pdf_pool is not None:
+            pdf_pool.shutdown(wait=False, cancel_futures=True)
+            pdf_pool = None
+
+    @commands.command()
+    async def summarypdf(self, ctx, date_str: str, *args):
+        date_filter = parse_date(date_str)
+        if not date_filter:
+            await ctx.send("⚠️ Invalid date format! Use DD-MM-YYYY.")
+            return
+        channel_filter = None
+        if args:
+            ch = detect_channel(ctx, list(args))
+            if ch:
+                channel_filter = ch
+        window = local_day_bounds(date_filter)
+        if channel_filter:
+            await plan_channel(channel_filter, window=window)
+        else:
+            await plan_guild(ctx.guild, window)
+        paths = await summary_pdf_files(ctx.guild.id, channel_filter, date_filter)
+        if not paths:
+            await ctx.send(f"❌ No messages found for {date_filter}.")
+            return
+        for i in range(0, len(paths), PDF_FILES_PER_MESSAGE):
+            files = []
+            for n, path in enumerate(paths[i:i + PDF_FILES_PER_MESSAGE], start=i + 1):
+                suffix = f"_part{n}" if len(paths) > 1 else ""
+                files.append(discord.File(
+                    path, filename=f"chat_summary_{date_filter}{suffix}.pdf"))
+            await ctx.send(content=f"✅ Chat summary PDF for {date_filter}"
+                           if i == 0 else None, files=files)
+
+
+async def setup(bot):
+    await bot.add_cog(SummaryPDF(bot))
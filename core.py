@@ -0,0 +1,2030 @@
+# core.py (client, database and ingestion shared by every extension)
+import time
+
+STARTED_AT = time.perf_counter()  # everything below counts towards time-to-ready
+
+import re
+import sys
+import json
+import zlib
+import heapq
+import shutil
+import sqlite3
+import asyncio
+import functools
+import bisect
+import subprocess
+import importlib.util
+from collections import Counter, deque, namedtuple
+import threading
+import logging
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import os
+import mimetypes
+from urllib.parse import urlparse
+
+# dotenv (optional local testing)
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import discord
+from discord.ext import commands
+from aiohttp import web
+
+from workers import open_archive
+
+# ---------- Load token ----------
+TOKEN = os.getenv("DISCORD_TOKEN")
+
+# ---------- timezone ----------
+TIMEZONE_NAME = "Asia/Kolkata"
+try:
+    from zoneinfo import ZoneInfo
+    LOCAL_TZ = ZoneInfo(TIMEZONE_NAME)
+except Exception:
+    LOCAL_TZ = timezone.utc
+
+# ---------- bot setup ----------
+intents = discord.Intents.default()
+intents.messages = True
+intents.message_content = True
+intents.members = True
+intents.voice_states = True
+# feature extensions; a text-only deployment can drop cogs.pdf / cogs.music
+EXTENSIONS = [name.strip() for name in os.getenv(
+    "EXTENSIONS", "cogs.finder,cogs.pdf,cogs.music,cogs.activity").split(",")
+    if name.strip()]
+# 429s asking for a longer wait than this raise discord.RateLimited instead
+# of being slept through (discord.py enforces at least 30s)
+MAX_RATELIMIT_TIMEOUT = float(os.getenv("MAX_RATELIMIT_TIMEOUT", "30"))
+
+
+class ChatFinderBot(commands.Bot):
+
+    ready_after = None  # seconds from process start to the first READY
+
+    async def setup_hook(self):
+        # schema setup/migrations overlap the gateway login; reads wait for it
+        db.start(init_schema)
+        ingest.start()
+        self.lag_sampler = asyncio.create_task(sample_loop_lag())
+        self.maintenance = asyncio.create_task(maintenance_loop())
+        await start_metrics_server()
+        for name in EXTENSIONS:
+            with timed("extension_load_seconds", extension=name):
+                await self.load_extension(name)
+
+    async def on_command_error(self, ctx, error):
+        if isinstance(error, commands.NoPrivateMessage):
+            await ctx.send("⚠️ This command only works in a server.")
+            return
+        await super().on_command_error(ctx, error)
+
+    async def close(self):
+        if getattr(self, "maintenance", None):
+            self.maintenance.cancel()
+        # flush queued messages before the connection goes away
+        await ingest.stop()
+        for name in list(self.extensions):
+            await self.unload_extension(name)
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await asyncio.to_thread(db.close)
+        await super().close()
+
+
+bot = ChatFinderBot(command_prefix="!", intents=intents,
+                    max_ratelimit_timeout=MAX_RATELIMIT_TIMEOUT)
+
+# ---------- Metrics ----------
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))  # 0 disables the endpoint
+LOOP_LAG_INTERVAL = 0.5  # seconds between event-loop lag samples
+metrics_runner = None
+
+
+class Histogram:
+    """Prometheus-style cumulative buckets, plus the most recent samples for
+    the percentiles shown by !metrics."""
+
+    BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5,
+               10, 30, 60)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+        self.recent = deque(maxlen=512)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+        self.recent.append(value)
+
+    def quantile(self, q):
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Metrics:
+    """In-process registry; everything is updated from the event loop."""
+
+    HELP = {
+        "command_seconds": "Command latency from invoke to completion.",
+        "command_errors_total": "Commands that raised.",
+        "db_seconds": "Database calls, including the wait for a pool thread.",
+        "history_pages_total": "Message history pages fetched from Discord.",
+        "history_messages_total": "Messages fetched through history.",
+        "loop_lag_seconds": "How late the event loop ran a scheduled wakeup.",
+        "ytdl_seconds": "yt-dlp lookups.",
+        "pdf_render_seconds": "Summary PDF renders in the worker pool.",
+        "extension_load_seconds": "Extension imports and setup at startup.",
+        "maintenance_seconds": "Archiving, vacuum and analyze steps.",
+        "activity_seconds": "!activity extract loads, appends, compute and render.",
+        "rate_limits_total": "429 responses from Discord (retried or raised).",
+    }
+
+    def __init__(self):
+        self.started = time.time()
+        self.histograms = {}  # (name, labels) -> Histogram
+        self.counters = {}  # (name, labels) -> float
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        hist = self.histograms.get(key)
+        if hist is None:
+            hist = self.histograms[key] = Histogram()
+        hist.observe(value)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def histogram(self, name, **labels):
+        return self.histograms.get((name, tuple(sorted(labels.items()))))
+
+    def series(self, name):
+        return [(dict(labels), h) for (n, labels), h in self.histograms.items()
+                if n == name]
+
+
+metrics = Metrics()
+
+
+@contextlib.contextmanager
+def timed(name, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.observe(name, time.perf_counter() - start, **labels)
+
+
+async def fetch_history(channel, **kwargs):
+    """channel.history(), counting API pages (up to 100 messages each)."""
+    got = 0
+    try:
+        async for message in channel.history(**kwargs):
+            if got % 100 == 0:
+                metrics.inc("history_pages_total")
+            got += 1
+            yield message
+        if got == 0:
+            metrics.inc("history_pages_total")
+    finally:
+        metrics.inc("history_messages_total", got)
+
+
+# discord.py sleeps through shorter 429s and retries on its own, so callers
+# never see them; its warning log is the only report. This handler turns
+# those into a counter and calls listener(channel_id or None, retry_after).
+RATE_LIMIT_LISTENERS = []
+ROUTE_CHANNEL = re.compile(r"/channels/(\d+)")
+
+
+class RateLimitLog(logging.Handler):
+
+    def emit(self, record):
+        if "responded with 429" not in str(record.msg) or len(record.args or ()) < 3:
+            return
+        _, url, retry_after = record.args[:3]
+        match = ROUTE_CHANNEL.search(str(url))
+        metrics.inc("rate_limits_total")
+        for listener in RATE_LIMIT_LISTENERS:
+            listener(int(match.group(1)) if match else None, float(retry_after))
+
+
+logging.getLogger("discord.http").addHandler(RateLimitLog())
+
+
+async def sample_loop_lag():
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        metrics.observe("loop_lag_seconds",
+                        max(0.0, loop.time() - start - LOOP_LAG_INTERVAL))
+
+
+@bot.before_invoke
+async def start_command_timer(ctx):
+    ctx.started_at = time.perf_counter()
+
+
+@bot.after_invoke
+async def record_command_time(ctx):
+    name = ctx.command.qualified_name
+    metrics.observe("command_seconds",
+                    time.perf_counter() - ctx.started_at, command=name)
+    if ctx.command_failed:
+        metrics.inc("command_errors_total", command=name)
+
+
+GAUGE_PROVIDERS = []  # extension callables returning more gauges()
+
+
+def gauges():
+    """Values read at scrape time: name -> [(labels, value)]."""
+    m = ingest.metrics()
+    latency = bot.latency
+    values = {
+        "uptime_seconds": [({}, time.time() - metrics.started)],
+        "startup_seconds": [({}, bot.ready_after or 0.0)],
+        "gateway_latency_seconds": [({}, latency if latency == latency else 0.0)],
+        "guilds": [({}, len(bot.guilds))],
+        "ingest_queue_depth": [({}, m["depth"])],
+        "ingest_written_total": [({}, m["written"])],
+        "ingest_errors_total": [({}, m["errors"])],
+        "voice_clients": [({}, len(bot.voice_clients))],
+        "db_bytes": [({}, db_bytes())],
+        "archive_months": [({}, len(archive.parts))],
+        "archive_bytes": [({}, sum(p.bytes for p in archive.parts))],
+    }
+    for provider in GAUGE_PROVIDERS:
+        values.update(provider())
+    return values
+
+
+def prometheus_text():
+    def fmt(labels):
+        if not labels:
+            return ""
+        body = ",".join('{}="{}"'.format(
+            k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+                        for k, v in labels.items())
+        return "{" + body + "}"
+
+    lines = []
+    names = sorted({n for n, _ in metrics.histograms})
+    for name in names:
+        full = "chatfinder_" + name
+        lines.append(f"# HELP {full} {metrics.HELP.get(name, name)}")
+        lines.append(f"# TYPE {full} histogram")
+        for labels, hist in metrics.series(name):
+            total = 0
+            for bound, n in zip(hist.BUCKETS + ("+Inf", ), hist.counts):
+                total += n
+                lines.append(f"{full}_bucket{fmt({**labels, 'le': bound})} {total}")
+            lines.append(f"{full}_sum{fmt(labels)} {hist.sum}")
+            lines.append(f"{full}_count{fmt(labels)} {hist.count}")
+    for name in sorted({n for n, _ in metrics.counters}):
+        full = "chatfinder_" + name
+        lines.append(f"# HELP {full} {metrics.HELP.get(name, name)}")
+        lines.append(f"# TYPE {full} counter")
+        for (n, labels), value in metrics.counters.items():
+            if n == name:
+                lines.append(f"{full}{fmt(dict(labels))} {value}")
+    for name, values in gauges().items():
+        full = "chatfinder_" + name
+        kind = "counter" if name.endswith("_total") else "gauge"
+        lines.append(f"# TYPE {full} {kind}")
+        for labels, value in values:
+            lines.append(f"{full}{fmt(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+async def start_metrics_server():
+    global metrics_runner
+    if not METRICS_PORT:
+        return
+
+    async def handle(request):
+        return web.Response(text=prometheus_text(),
+                            content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    metrics_runner = web.AppRunner(app, access_log=None)
+    await metrics_runner.setup()
+    try:
+        await web.TCPSite(metrics_runner, METRICS_HOST, METRICS_PORT).start()
+        print(f"📈 Metrics on http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+    except OSError as e:
+        print("⚠️ Metrics endpoint not started:", e)
+        await metrics_runner.cleanup()
+        metrics_runner = None
+
+
+def format_ms(seconds):
+    return f"{seconds * 1000:.0f}ms" if seconds < 10 else f"{seconds:.1f}s"
+
+
+@bot.command(name="metrics")
+async def command_metrics(ctx):
+    if not await bot.is_owner(ctx.author):
+        await ctx.send("⚠️ Only the bot owner can view metrics.")
+        return
+    g = {name: values for name, values in gauges().items()}
+    lag = metrics.histogram("loop_lag_seconds") or Histogram()
+    lines = [
+        "📈 **Metrics**",
+        f"Uptime: {format_duration(g['uptime_seconds'][0][1])} | "
+        f"Gateway: {format_ms(g['gateway_latency_seconds'][0][1])} | "
+        f"Loop lag: p95 {format_ms(lag.quantile(0.95))}, max {format_ms(lag.max)}",
+        f"Ingest queue: {g['ingest_queue_depth'][0][1]} | "
+        f"History: {metrics.counters.get(('history_pages_total', ()), 0):.0f} pages, "
+        f"{metrics.counters.get(('history_messages_total', ()), 0):.0f} messages, "
+        f"{metrics.counters.get(('rate_limits_total', ()), 0):.0f} rate limits",
+    ]
+    for label, name, labels in (("DB read", "db_seconds", {"op": "read"}),
+                                ("DB write", "db_seconds", {"op": "write"}),
+                                ("yt-dlp", "ytdl_seconds", {}),
+                                ("PDF render", "pdf_render_seconds", {})):
+        hist = metrics.histogram(name, **labels)
+        if hist:
+            lines.append(f"{label}: {hist.count} | p50 {format_ms(hist.quantile(0.5))}, "
+                         f"p95 {format_ms(hist.quantile(0.95))}, max {format_ms(hist.max)}")
+    players = ", ".join(f"{n} {state}" for labels, n in g.get("voice_players", [])
+                        for state in labels.values())
+    lines.append(f"Voice: {g['voice_clients'][0][1]} connected"
+                 + (f" ({players})" if players else ""))
+    commands_seen = sorted(metrics.series("command_seconds"),
+                           key=lambda s: -s[1].count)
+    if commands_seen:
+        lines.append("\n**Commands** (calls, p50 / p95, errors)")
+        for labels, hist in commands_seen[:15]:
+            errors = metrics.counters.get(
+                ("command_errors_total", (("command", labels["command"]), )), 0)
+            lines.append(f"!{labels['command']}: {hist.count}, "
+                         f"{format_ms(hist.quantile(0.5))} / "
+                         f"{format_ms(hist.quantile(0.95))}, {errors:.0f}")
+    await ctx.send("\n".join(lines))
+
+
+# ---------- Database ----------
+DB_PATH = os.getenv("DB_PATH", "messages.db")
+DB_READERS = int(os.getenv("DB_READERS", "4"))
+
+SCHEMA_VERSION = 7
+LEGACY_UNTIL = None  # ms; newest migrated v1 row still waiting for its real message
+
+# messages are keyed by their Discord snowflake, so re-indexing the same
+# history is a no-op (INSERT OR IGNORE). `ts` is epoch milliseconds (UTC);
+# `author` / `channel` keep the display names as they were at ingest time.
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS messages (
+    message_id INTEGER PRIMARY KEY,
+    guild_id INTEGER,
+    channel_id INTEGER,
+    author_id INTEGER,
+    ts INTEGER NOT NULL,
+    author TEXT,
+    channel TEXT,
+    content TEXT,
+    attachments TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_messages_channel_ts ON messages(channel_id, ts);
+CREATE INDEX IF NOT EXISTS idx_messages_author_ts ON messages(author_id, ts);
+CREATE INDEX IF NOT EXISTS idx_messages_guild_ts ON messages(guild_id, ts);
+-- rows migrated from the old name-keyed table, waiting for IDs (see on_ready)
+CREATE INDEX IF NOT EXISTS idx_messages_legacy_channel ON messages(channel)
+    WHERE channel_id IS NULL;
+CREATE INDEX IF NOT EXISTS idx_messages_legacy_author ON messages(author)
+    WHERE author_id IS NULL;
+-- Full-text index over message content, kept in sync with `messages` by triggers.
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    content, content='messages', content_rowid='message_id'
+);
+CREATE TRIGGER IF NOT EXISTS messages_fts_ai AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts(rowid, content)
+    VALUES (new.message_id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_fts_ad AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, content)
+    VALUES ('delete', old.message_id, old.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_fts_au AFTER UPDATE OF content ON messages BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, content)
+    VALUES ('delete', old.message_id, old.content);
+    INSERT INTO messages_fts(rowid, content)
+    VALUES (new.message_id, new.content);
+END;
+
+-- per-channel crawl watermarks for incremental !index: everything between
+-- oldest_id and newest_id is indexed; complete = reached the channel start;
+-- synced_at = last time (ms) a crawl reached the newest message
+CREATE TABLE IF NOT EXISTS index_checkpoints (
+    channel_id INTEGER PRIMARY KEY,
+    guild_id INTEGER,
+    newest_id INTEGER,
+    oldest_id INTEGER,
+    complete INTEGER NOT NULL DEFAULT 0,
+    updated_at INTEGER,
+    synced_at INTEGER
+);
+-- one row per attachment; `day` is the LOCAL_TZ date as YYYYMMDD and
+-- `kind` is image / video / file
+CREATE TABLE IF NOT EXISTS attachments (
+    attachment_id INTEGER PRIMARY KEY,
+    message_id INTEGER NOT NULL,
+    guild_id INTEGER,
+    channel_id INTEGER,
+    ts INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    filename TEXT,
+    ext TEXT,
+    content_type TEXT,
+    size INTEGER,
+    url TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_attachments_channel_day_kind
+    ON attachments(channel_id, day, kind);
+-- past snowflake ranges [start_id, end_id) fetched outside the checkpointed
+-- range (e.g. one day far back in history)
+CREATE TABLE IF NOT EXISTS indexed_windows (
+    channel_id INTEGER NOT NULL,
+    start_id INTEGER NOT NULL,
+    end_id INTEGER NOT NULL,
+    PRIMARY KEY (channel_id, start_id, end_id)
+);
+-- cold months moved out of `messages` into per-month files (see Archive);
+-- `month` is the LOCAL_TZ month as YYYYMM, [start_ts, end_ts) its ms range
+CREATE TABLE IF NOT EXISTS archives (
+    month INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    start_ts INTEGER NOT NULL,
+    end_ts INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    updated_at INTEGER
+);
+-- migrated v1 rows still keyed by a synthetic snowflake; each is replaced
+-- by the real message when history is fetched again (replace_legacy)
+CREATE TABLE IF NOT EXISTS legacy_messages (message_id INTEGER PRIMARY KEY);
+"""
+
+# Rollup counters for !stats, maintained by triggers on `messages` so every
+# insert path (live ingest, !index, crawls, migrations) keeps them exact.
+# Unknown IDs (rows migrated from v1) are counted under 0.
+STATS_TABLES_SQL = """
+CREATE TABLE IF NOT EXISTS stats_daily (
+    guild_id INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    author_id INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, day, channel_id, author_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS stats_authors (
+    guild_id INTEGER NOT NULL,
+    author_id INTEGER NOT NULL,
+    author TEXT,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, author_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_stats_authors_count ON stats_authors(guild_id, count);
+CREATE TABLE IF NOT EXISTS stats_channels (
+    guild_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    channel TEXT,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, channel_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS stats_channel_authors (
+    guild_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    author_id INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, channel_id, author_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_stats_channel_authors_count
+    ON stats_channel_authors(guild_id, channel_id, count);
+"""
+
+
+def stats_upserts(row, delta):
+    """Rollup statements adding `delta` for the `new` or `old` trigger row."""
+    g = f"COALESCE({row}.guild_id, 0)"
+    ch = f"COALESCE({row}.channel_id, 0)"
+    a = f"COALESCE({row}.author_id, 0)"
+    name = f"CASE WHEN {row}.author_id IS NULL THEN NULL ELSE {row}.author END"
+    return f"""
+    INSERT INTO stats_daily VALUES ({g}, local_day({row}.ts), {ch}, {a}, {delta})
+        ON CONFLICT DO UPDATE SET count = count + {delta};
+    INSERT INTO stats_authors VALUES ({g}, {a}, {name}, {delta})
+        ON CONFLICT DO UPDATE SET count = count + {delta}, author = excluded.author;
+    INSERT INTO stats_channels VALUES ({g}, {ch}, {row}.channel, {delta})
+        ON CONFLICT DO UPDATE SET count = count + {delta}, channel = excluded.channel;
+    INSERT INTO stats_channel_authors VALUES ({g}, {ch}, {a}, {delta})
+        ON CONFLICT DO UPDATE SET count = count + {delta};"""
+
+
+# moving rows into the archive is not a delete as far as rollups are concerned
+STATS_TRIGGERS_SQL = f"""
+CREATE TRIGGER IF NOT EXISTS messages_stats_ai AFTER INSERT ON messages BEGIN
+    {stats_upserts("new", 1)}
+END;
+CREATE TRIGGER IF NOT EXISTS messages_stats_ad AFTER DELETE ON messages
+WHEN NOT archiving() BEGIN
+    {stats_upserts("old", -1)}
+END;
+CREATE TRIGGER IF NOT EXISTS messages_stats_au
+AFTER UPDATE OF guild_id, channel_id, author_id ON messages BEGIN
+    {stats_upserts("old", -1)}
+    {stats_upserts("new", 1)}
+END;
+"""
+
+# Per-day topic mentions for !summary, counted at insert time by the same
+# trigger mechanism. topic_json() runs the guild's TopicClassifier.
+TOPIC_TABLES_SQL = """
+CREATE TABLE IF NOT EXISTS topic_counts (
+    guild_id INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    topic TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, day, channel_id, topic)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS topic_categories (
+    guild_id INTEGER NOT NULL,
+    topic TEXT NOT NULL,
+    keyword TEXT NOT NULL,
+    PRIMARY KEY (guild_id, topic, keyword)
+) WITHOUT ROWID;
+"""
+
+
+def topic_upserts(row, sign):
+    return f"""
+    INSERT INTO topic_counts
+    SELECT COALESCE({row}.guild_id, 0), local_day({row}.ts),
+           COALESCE({row}.channel_id, 0), key, {sign} * value
+    FROM json_each(topic_json({row}.guild_id, {row}.content)) WHERE true
+    ON CONFLICT DO UPDATE SET count = count + excluded.count;"""
+
+
+TOPIC_TRIGGERS_SQL = f"""
+CREATE TRIGGER IF NOT EXISTS messages_topics_ai AFTER INSERT ON messages BEGIN
+    {topic_upserts("new", 1)}
+END;
+CREATE TRIGGER IF NOT EXISTS messages_topics_ad AFTER DELETE ON messages
+WHEN NOT archiving() BEGIN
+    {topic_upserts("old", -1)}
+END;
+CREATE TRIGGER IF NOT EXISTS messages_topics_au
+AFTER UPDATE OF guild_id, channel_id ON messages BEGIN
+    {topic_upserts("old", -1)}
+    {topic_upserts("new", 1)}
+END;
+"""
+
+# v1 stored names and ISO text; move it aside so the v2 table can be built
+LEGACY_RENAME_SQL = """
+DROP TRIGGER IF EXISTS messages_fts_ai;
+DROP TRIGGER IF EXISTS messages_fts_ad;
+DROP TRIGGER IF EXISTS messages_fts_au;
+DROP TABLE IF EXISTS messages_fts;
+ALTER TABLE messages RENAME TO messages_v1;
+"""
+
+# v5 delete triggers predate archiving(); recreated by the script below
+ARCHIVE_TRIGGERS_SQL = """
+DROP TRIGGER IF EXISTS messages_stats_ad;
+DROP TRIGGER IF EXISTS messages_topics_ad;
+"""
+
+
+class Database:
+    """SQLite behind thread pools so disk I/O never runs on the event loop.
+
+    All writes go through a single writer thread that owns the write
+    connection; reads run on a pool of threads, each with its own
+    connection. WAL mode lets those readers proceed while a write is open.
+    """
+
+    def __init__(self, path, readers):
+        self.path = path
+        self._writer = ThreadPoolExecutor(max_workers=1,
+                                          thread_name_prefix="db-writer")
+        self._readers = ThreadPoolExecutor(max_workers=readers,
+                                           thread_name_prefix="db-reader")
+        self._local = threading.local()
+        self._write_conn = None
+        self._read_conns = []
+        self.ready = None
+
+    def _connect(self):
+        c = sqlite3.connect(self.path, check_same_thread=False)
+        c.execute("PRAGMA busy_timeout = 5000")
+        return c
+
+    def _writer_conn(self):
+        if self._write_conn is None:
+            c = self._connect()
+            c.execute("PRAGMA journal_mode = WAL")
+            c.execute("PRAGMA synchronous = NORMAL")
+            self._write_conn = c
+        return self._write_conn
+
+    def _reader_conn(self):
+        c = getattr(self._local, "conn", None)
+        if c is None:
+            c = self._connect()
+            c.execute("PRAGMA query_only = ON")
+            self._local.conn = c
+            self._read_conns.append(c)
+        return c
+
+    def _transaction(self, fn, *args):
+        c = self._writer_conn()
+        with c:
+            return fn(c, *args)
+
+    def _query(self, fn, *args):
+        return fn(self._reader_conn(), *args)
+
+    def start(self, init):
+        """Run init(conn) in the background. Later writes queue behind it on
+        the writer thread; reads wait for it."""
+        self.ready = asyncio.ensure_future(self.write(init))
+
+    async def write(self, fn, *args):
+        """Run fn(conn, *args) on the writer thread in one transaction."""
+        loop = asyncio.get_running_loop()
+        with timed("db_seconds", op="write"):
+            return await loop.run_in_executor(
+                self._writer, functools.partial(self._transaction, fn, *args))
+
+    async def read(self, fn, *args):
+        """Run fn(conn, *args) on a reader thread."""
+        if self.ready is not None and not self.ready.done():
+            await asyncio.shield(self.ready)
+        loop = asyncio.get_running_loop()
+        with timed("db_seconds", op="read"):
+            return await loop.run_in_executor(
+                self._readers, functools.partial(self._query, fn, *args))
+
+    async def execute(self, sql, params=()):
+        return await self.write(lambda c: c.execute(sql, params).rowcount)
+
+    async def executemany(self, sql, rows):
+        return await self.write(lambda c: c.executemany(sql, rows).rowcount)
+
+    async def fetchall(self, sql, params=()):
+        return await self.read(lambda c: c.execute(sql, params).fetchall())
+
+    async def fetchone(self, sql, params=()):
+        return await self.read(lambda c: c.execute(sql, params).fetchone())
+
+    def close(self):
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+        for c in self._read_conns:
+            c.close()
+        if self._write_conn is not None:
+            self._write_conn.close()
+
+
+def init_schema(c):
+    # functions used by the rollup triggers; only the writer runs them
+    c.create_function("local_day", 1, day_key, deterministic=True)
+    c.create_function("topic_json", 2, topic_json)
+    c.create_function("archiving", 0, lambda: archive.deleting)
+    version = c.execute("PRAGMA user_version").fetchone()[0]
+    if version == 0:
+        # only possible before the first table; older files switch over in
+        # their first maintenance run (vacuum_step)
+        c.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    legacy = version < 2 and c.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages'"
+    ).fetchone()
+    # BEGIN inside the script keeps the whole migration in one transaction
+    c.executescript("BEGIN;" + (LEGACY_RENAME_SQL if legacy else "") +
+                    (ARCHIVE_TRIGGERS_SQL if 0 < version < 6 else "") +
+                    SCHEMA_SQL + STATS_TABLES_SQL + STATS_TRIGGERS_SQL +
+                    TOPIC_TABLES_SQL + TOPIC_TRIGGERS_SQL)
+    load_topic_categories(c)
+    if legacy:
+        migrate_v1(c)
+    if version < 3:
+        migrate_v2_attachments(c)
+    if version < 4:
+        rebuild_stats(c)
+    if version < 5:
+        rebuild_topics(c)
+    if 2 <= version < 7:
+        find_legacy_rows(c)
+    c.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    archive.load(c)
+    load_legacy(c)
+
+
+def migrate_v1(c):
+    """Copy v1 rows into the snowflake-keyed table.
+
+    v1 never stored Discord IDs, so each row gets a synthetic snowflake built
+    from its timestamp (keeps ordering and snowflake range queries working)
+    and is listed in legacy_messages until the real message replaces it.
+    Exact duplicates left behind by repeated !index runs are dropped.
+    """
+    seen = set()
+    rows = []
+    seq = {}
+    for author, content, created_at, channel, attachments in c.execute(
+            "SELECT author, content, created_at, channel, attachments "
+            "FROM messages_v1 ORDER BY id"):
+        key = (author, content, created_at, channel)
+        if key in seen or not created_at:
+            continue
+        seen.add(key)
+        dt = datetime.fromisoformat(created_at)
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        snowflake = discord.utils.time_snowflake(dt)
+        n = seq.get(snowflake, 0)
+        seq[snowflake] = n + 1
+        rows.append((snowflake + n, to_ms(dt), author, channel, content,
+                     attachments))
+    c.executemany(
+        "INSERT OR IGNORE INTO messages (message_id, ts, author, channel, content, attachments) "
+        "VALUES (?, ?, ?, ?, ?, ?)", rows)
+    c.executemany("INSERT OR IGNORE INTO legacy_messages VALUES (?)",
+                  [(row[0], ) for row in rows])
+    c.execute("DROP TABLE messages_v1")
+    print(f"✅ Migrated {len(rows)} messages to schema v{SCHEMA_VERSION}")
+
+
+def find_legacy_rows(c):
+    """Lists rows migrated by an older migrate_v1 in legacy_messages: their
+    IDs sit in the first 4096 of their millisecond, where a real snowflake's
+    worker and process bits rarely put one. A real message caught by this
+    only costs a lookup; replace_legacy never deletes the row it is
+    inserting."""
+    c.execute(
+        "INSERT OR IGNORE INTO legacy_messages SELECT message_id FROM messages "
+        "WHERE message_id - ((ts - ?) << 22) BETWEEN 0 AND 4095",
+        (discord.utils.DISCORD_EPOCH, ))
+
+
+def load_legacy(c):
+    global LEGACY_UNTIL
+    LEGACY_UNTIL = c.execute(
+        "SELECT MAX(m.ts) FROM legacy_messages l JOIN messages m USING (message_id)"
+    ).fetchone()[0]
+
+
+def replace_legacy(c, rows):
+    """Deletes the migrated v1 rows that `rows` (message_row tuples) are the
+    real versions of, so re-fetched history is not stored twice: same
+    millisecond and channel (by ID once backfill_legacy_ids attached one,
+    else by name), with the content deciding between several candidates.
+    The delete triggers take them out of FTS and the rollups."""
+    stale = []
+    for message_id, _, channel_id, _, ts, _, channel, content, _ in rows:
+        found = c.execute(
+            "SELECT l.message_id, m.content FROM legacy_messages l "
+            "JOIN messages m USING (message_id) "
+            "WHERE l.message_id BETWEEN ? AND ? AND l.message_id != ? AND m.ts = ? "
+            "AND (m.channel_id = ? OR (m.channel_id IS NULL AND m.channel = ?))",
+            ((ts - discord.utils.DISCORD_EPOCH) << 22,
+             ((ts - discord.utils.DISCORD_EPOCH) << 22) + 4095,
+             message_id, ts, channel_id, channel)).fetchall()
+        if len(found) > 1:
+            found = [row for row in found if row[1] == content][:1]
+        stale += [(row[0], ) for row in found]
+    # a real message wrongly listed by find_legacy_rows drops out here
+    c.executemany("DELETE FROM legacy_messages WHERE message_id = ?",
+                  [(row[0], ) for row in rows] + stale)
+    if stale:
+        c.executemany("DELETE FROM attachments WHERE message_id = ?", stale)
+        c.executemany("DELETE FROM messages WHERE message_id = ?", stale)
+
+
+def migrate_v2_attachments(c):
+    """Fill the attachments table from the URLs already stored on messages.
+
+    Size and content type were never recorded, but CDN URLs carry the
+    channel ID, attachment ID and filename.
+    """
+    rows = []
+    for message_id, guild_id, channel_id, ts, attachments in c.execute(
+            "SELECT message_id, guild_id, channel_id, ts, attachments "
+            "FROM messages WHERE attachments IS NOT NULL"):
+        for url in attachments.split(","):
+            parts = urlparse(url).path.strip("/").split("/")
+            if len(parts) < 4 or not parts[1].isdigit() or not parts[2].isdigit():
+                continue
+            filename = parts[3]
+            rows.append((int(parts[2]), message_id, guild_id,
+                         channel_id or int(parts[1]), ts, day_key(ts),
+                         attachment_kind(filename, None), filename,
+                         file_ext(filename), mimetypes.guess_type(filename)[0],
+                         None, url))
+    c.executemany(INSERT_ATTACHMENT_SQL, rows)
+    if rows:
+        print(f"✅ Indexed {len(rows)} existing attachments")
+
+
+def rebuild_stats(c):
+    """Recompute every rollup table from `messages`."""
+    for table in ("stats_daily", "stats_authors", "stats_channels",
+                  "stats_channel_authors"):
+        c.execute(f"DELETE FROM {table}")
+    keys = ("COALESCE(guild_id, 0)", "COALESCE(channel_id, 0)",
+            "COALESCE(author_id, 0)")
+    g, ch, a = keys
+    c.execute(f"INSERT INTO stats_daily SELECT {g}, local_day(ts), {ch}, {a}, COUNT(*) "
+              "FROM messages GROUP BY 1, 2, 3, 4")
+    c.execute(f"INSERT INTO stats_authors SELECT {g}, {a}, "
+              "MAX(CASE WHEN author_id IS NULL THEN NULL ELSE author END), COUNT(*) "
+              "FROM messages GROUP BY 1, 2")
+    c.execute(f"INSERT INTO stats_channels SELECT {g}, {ch}, MAX(channel), COUNT(*) "
+              "FROM messages GROUP BY 1, 2")
+    c.execute(f"INSERT INTO stats_channel_authors SELECT {g}, {ch}, {a}, COUNT(*) "
+              "FROM messages GROUP BY 1, 2, 3")
+
+
+def rebuild_topics(c, guild_id=None):
+    """Recount topic_counts from `messages` (all guilds or just one)."""
+    where = "" if guild_id is None else "WHERE COALESCE(m.guild_id, 0) = ?"
+    params = () if guild_id is None else (guild_id, )
+    c.execute(
+        "DELETE FROM topic_counts" +
+        ("" if guild_id is None else " WHERE guild_id = ?"), params)
+    c.execute(
+        "INSERT INTO topic_counts "
+        "SELECT COALESCE(m.guild_id, 0), local_day(m.ts), COALESCE(m.channel_id, 0), j.key, SUM(j.value) "
+        "FROM messages m, json_each(topic_json(m.guild_id, m.content)) j "
+        f"{where} GROUP BY 1, 2, 3, 4", params)
+    # archived months are counted on their own connection, then merged in
+    for part in archive.parts:
+        a = open_archive(part.path)
+        a.create_function("local_day", 1, day_key, deterministic=True)
+        a.create_function("topic_json", 2, topic_json)
+        try:
+            rows = a.execute(
+                "SELECT COALESCE(m.guild_id, 0), local_day(m.ts), COALESCE(m.channel_id, 0), j.key, SUM(j.value) "
+                "FROM messages m, json_each(topic_json(m.guild_id, m.content)) j "
+                f"{where} GROUP BY 1, 2, 3, 4", params).fetchall()
+        finally:
+            a.close()
+        c.executemany(
+            "INSERT INTO topic_counts VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT DO UPDATE SET count = count + excluded.count", rows)
+
+
+def backfill_legacy_ids(c, channels, authors):
+    """Attach IDs to migrated v1 rows by matching names that are unambiguous.
+
+    `channels` is [(channel_id, guild_id, name)], `authors` [(user_id, name)].
+    """
+    names = {}
+    for channel_id, guild_id, name in channels:
+        names.setdefault(name, []).append((channel_id, guild_id))
+    c.executemany(
+        "UPDATE messages SET channel_id = ?, guild_id = ? "
+        "WHERE channel_id IS NULL AND channel = ?",
+        [(ids[0][0], ids[0][1], name) for name, ids in names.items()
+         if len(ids) == 1])
+    c.executemany(
+        "UPDATE messages SET author_id = ? "
+        "WHERE author_id IS NULL AND author = ?", authors)
+
+
+db = Database(DB_PATH, DB_READERS)
+
+# ---------- Archive ----------
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+# months kept in the hot table besides the current one; 0 = never archive
+ARCHIVE_AFTER_MONTHS = int(os.getenv("ARCHIVE_AFTER_MONTHS", "3"))
+# archived months older than this are deleted; 0 = keep forever
+ARCHIVE_RETENTION_MONTHS = int(os.getenv("ARCHIVE_RETENTION_MONTHS", "0"))
+MAINTENANCE_HOURS = float(os.getenv("MAINTENANCE_HOURS", "6"))  # 0 = off
+ARCHIVE_BATCH = 2000  # rows per copy / delete step
+ARCHIVE_ZDICT_SIZE = 16384
+VACUUM_PAGES = 2000  # pages freed per incremental_vacuum step
+
+# An archive file keeps the hot table's columns, with `content` stored as
+# raw deflate against the month's preset dictionary (or as plain text when
+# that is not smaller). The `messages` view decompresses on read, so SQL
+# written for the hot table (search_query etc.) runs unchanged against it.
+ARCHIVE_SCHEMA_SQL = """
+CREATE TABLE messages_z (
+    message_id INTEGER PRIMARY KEY,
+    guild_id INTEGER,
+    channel_id INTEGER,
+    author_id INTEGER,
+    ts INTEGER NOT NULL,
+    author TEXT,
+    channel TEXT,
+    content,
+    attachments TEXT
+);
+CREATE TABLE meta (key TEXT PRIMARY KEY, value);
+CREATE VIRTUAL TABLE messages_fts USING fts5(content, content='');
+CREATE VIEW messages AS
+    SELECT message_id, guild_id, channel_id, author_id, ts, author, channel,
+           inflate(content) AS content, attachments
+    FROM messages_z;
+"""
+ARCHIVE_INDEX_SQL = """
+CREATE INDEX IF NOT EXISTS idx_messages_channel_ts ON messages_z(channel_id, ts);
+CREATE INDEX IF NOT EXISTS idx_messages_author_ts ON messages_z(author_id, ts);
+CREATE INDEX IF NOT EXISTS idx_messages_guild_ts ON messages_z(guild_id, ts);
+"""
+ARCHIVE_SELECT_SQL = (
+    "SELECT message_id, guild_id, channel_id, author_id, ts, author, channel, content, attachments "
+    "FROM messages WHERE message_id >= ? AND message_id < ? "
+    # legacy rows still waiting for IDs (backfill_legacy_ids) or for their
+    # real message (replace_legacy) stay hot
+    "AND channel_id IS NOT NULL AND author_id IS NOT NULL "
+    "AND message_id NOT IN (SELECT message_id FROM legacy_messages)")
+
+Partition = namedtuple("Partition", "month path start_ts end_ts rows bytes version")
+
+
+def month_key(ts):
+    return day_key(ts) // 100
+
+
+def add_months(month, n):
+    year, mon = divmod(month, 100)
+    year, mon = divmod(year * 12 + mon - 1 + n, 12)
+    return year * 100 + mon + 1
+
+
+def month_bounds(month):
+    """Epoch-ms [start, end) of a YYYYMM month in LOCAL_TZ."""
+    year, mon = divmod(month, 100)
+    start = datetime(year, mon, 1, tzinfo=LOCAL_TZ)
+    end = datetime(year + mon // 12, mon % 12 + 1, 1, tzinfo=LOCAL_TZ)
+    return to_ms(start), to_ms(end)
+
+
+def snowflake_at(ts):
+    # message IDs are snowflakes, so a ts range is also a rowid range
+    return discord.utils.time_snowflake(from_ms(ts))
+
+
+def train_zdict(texts):
+    """Preset deflate dictionary for a month: its most frequent words, the
+    most frequent last (closest to the data, cheapest to reference)."""
+    counts = Counter(word for text in texts for word in text.split())
+    words = [word for word, _ in counts.most_common(4000)]
+    return " ".join(reversed(words)).encode()[-ARCHIVE_ZDICT_SIZE:]
+
+
+def deflate(text, zdict):
+    if not text:
+        return text
+    raw = text.encode()
+    z = zlib.compressobj(6, zlib.DEFLATED, -15, 9, zlib.Z_DEFAULT_STRATEGY,
+                         zdict)
+    packed = z.compress(raw) + z.flush()
+    return packed if len(packed) < len(raw) else text
+
+
+class Archive:
+    """Catalog of archived months plus per-thread connections to them.
+
+    Months older than ARCHIVE_AFTER_MONTHS are copied out of the hot
+    `messages` table into one read-only SQLite file per month, then deleted
+    from it, so the hot table, its indexes and its FTS index only hold
+    recent history. partitions() is the query layer: the hot connection
+    first, then only the archived months overlapping the requested range.
+    Rows can briefly exist in both while a month is being moved; readers
+    dedupe by message_id.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.parts = []  # Partition, newest month first
+        self.deleting = False  # read by the archiving() SQL function
+        self.lock = asyncio.Lock()
+        self.last_run = None
+        self._local = threading.local()
+
+    def load(self, c):
+        self.parts = [
+            Partition(month, os.path.join(self.root, name), *rest)
+            for month, name, *rest in c.execute(
+                "SELECT month, name, start_ts, end_ts, rows, bytes, version "
+                "FROM archives ORDER BY month DESC")]
+
+    @property
+    def horizon(self):
+        """Messages older than this may already be archived."""
+        return self.parts[0].end_ts if self.parts else 0
+
+    def find(self, ts):
+        for part in self.parts:
+            if part.start_ts <= ts < part.end_ts:
+                return part
+        return None
+
+    def covering(self, start=None, end=None):
+        return [p for p in self.parts
+                if (start is None or p.end_ts > start) and
+                (end is None or p.start_ts < end)]
+
+    def connect(self, part):
+        conns = self._local.__dict__.setdefault("conns", {})
+        cached = conns.get(part.path)
+        if cached is None or cached[0] != part.version:
+            if cached is not None:
+                cached[1].close()
+            cached = conns[part.path] = (part.version, open_archive(part.path))
+        return cached[1]
+
+    def partitions(self, c, start=None, end=None):
+        """(connection, Partition or None) to query on a reader thread: the
+        hot table, then archived months overlapping epoch-ms [start, end),
+        newest first."""
+        yield c, None
+        for part in self.covering(start, end):
+            yield self.connect(part), part
+
+    def unarchived(self, batch):
+        """Drops (message_row, attachment_rows) pairs that are already in an
+        archive, so re-fetching old history does not resurrect them."""
+        by_part = {}
+        for item in batch:
+            part = self.find(item[0][4])
+            if part is not None:
+                by_part.setdefault(part, set()).add(item[0][0])
+        if not by_part:
+            return batch
+        archived = set()
+        for part, ids in by_part.items():
+            c = open_archive(part.path)
+            try:
+                archived.update(
+                    mid for mid, in c.execute(
+                        "SELECT message_id FROM messages_z WHERE message_id BETWEEN ? AND ?",
+                        (min(ids), max(ids))) if mid in ids)
+            finally:
+                c.close()
+        return [item for item in batch if item[0][0] not in archived]
+
+    def summary(self):
+        rows = sum(p.rows for p in self.parts)
+        size = sum(p.bytes for p in self.parts)
+        if not self.parts:
+            return "Archive: empty"
+        return (f"Archive: {len(self.parts)} months, {rows:,} messages, "
+                f"{size / 1e6:.1f} MB ({self.parts[-1].month} to {self.parts[0].month})")
+
+
+archive = Archive(ARCHIVE_DIR)
+
+
+def read_newest(c, sql, params, limit, start=None, end=None):
+    """Runs on a reader thread: `sql` over every partition overlapping
+    [start, end), returning the newest `limit` rows. Rows must start with
+    message_id; `sql` should order newest first and apply the same limit.
+    Newest means highest snowflake, the same order the FTS rowid walk in
+    search_query yields. Stops early once older partitions cannot
+    contribute."""
+    rows = {}
+    for conn, part in archive.partitions(c, start, end):
+        if part and len(rows) >= limit:
+            oldest = heapq.nlargest(limit, rows)[-1]
+            if oldest >= snowflake_at(part.end_ts):
+                break
+        for row in conn.execute(sql, params):
+            rows.setdefault(row[0], row)
+    return [rows[mid] for mid in heapq.nlargest(limit, rows)]
+
+
+def archivable_months(c, before):
+    """Months (YYYYMM) with hot rows to archive older than epoch-ms `before`."""
+    months = []
+    low, high = 0, snowflake_at(before)
+    while True:
+        row = c.execute(
+            "SELECT ts FROM (" + ARCHIVE_SELECT_SQL + " ORDER BY message_id LIMIT 1)",
+            (low, high)).fetchone()
+        if row is None:
+            return months
+        months.append(month_key(row[0]))
+        low = max(low + 1, snowflake_at(month_bounds(months[-1])[1]))
+
+
+def build_archive(c, month, path):
+    """Runs on a reader thread: copies the month's hot rows into its archive
+    file (appending to an existing one), then indexes, analyzes and vacuums
+    it. Written to a temp file and renamed, so readers never see it half
+    built. Returns (rows, bytes)."""
+    start, end = month_bounds(month)
+    bounds = (snowflake_at(start), snowflake_at(end))
+    tmp = path + ".tmp"
+    if os.path.exists(path):
+        shutil.copyfile(path, tmp)
+        out = sqlite3.connect(tmp)
+        zdict = out.execute("SELECT value FROM meta WHERE key = 'zdict'").fetchone()[0]
+    else:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        sample = [text for text, in c.execute(
+            "SELECT content FROM (" + ARCHIVE_SELECT_SQL + " LIMIT 5000) "
+            "WHERE content IS NOT NULL", bounds)]
+        zdict = train_zdict(sample)
+        out = sqlite3.connect(tmp)
+        out.executescript(ARCHIVE_SCHEMA_SQL)
+        out.executemany("INSERT INTO meta VALUES (?, ?)",
+                        [("zdict", zdict), ("month", month)])
+    try:
+        cur = c.execute(ARCHIVE_SELECT_SQL + " ORDER BY message_id", bounds)
+        while True:
+            rows = cur.fetchmany(ARCHIVE_BATCH)
+            if not rows:
+                break
+            have = {mid for mid, in out.execute(
+                "SELECT message_id FROM messages_z WHERE message_id BETWEEN ? AND ?",
+                (rows[0][0], rows[-1][0]))}
+            rows = [row for row in rows if row[0] not in have]
+            out.executemany(
+                "INSERT INTO messages_z VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [row[:7] + (deflate(row[7], zdict), row[8]) for row in rows])
+            out.executemany(
+                "INSERT INTO messages_fts (rowid, content) VALUES (?, ?)",
+                [(row[0], row[7]) for row in rows if row[7]])
+        out.executescript(ARCHIVE_INDEX_SQL)
+        out.execute("INSERT INTO messages_fts (messages_fts) VALUES ('optimize')")
+        out.commit()
+        total = out.execute("SELECT COUNT(*) FROM messages_z").fetchone()[0]
+        out.execute("ANALYZE")
+        out.execute("VACUUM")
+    finally:
+        out.close()
+    os.replace(tmp, path)
+    return total, os.path.getsize(path)
+
+
+def save_partition(c, month, name, rows, size):
+    start, end = month_bounds(month)
+    c.execute(
+        "INSERT INTO archives VALUES (?, ?, ?, ?, ?, ?, 1, ?) "
+        "ON CONFLICT (month) DO UPDATE SET rows = excluded.rows, bytes = excluded.bytes, "
+        "version = version + 1, updated_at = excluded.updated_at",
+        (month, name, start, end, rows, size, int(time.time() * 1000)))
+    archive.load(c)
+
+
+def delete_archived(c, path, after):
+    """Deletes the next batch of hot rows that are in the archive at `path`
+    (message_id > after). Returns the last message_id covered, None when
+    done. Rollups are left alone: archiving() is true for the delete."""
+    c.execute("ATTACH DATABASE ? AS arch", (path, ))
+    try:
+        last = c.execute(
+            "SELECT MAX(message_id) FROM (SELECT message_id FROM arch.messages_z "
+            "WHERE message_id > ? ORDER BY message_id LIMIT ?)",
+            (after, ARCHIVE_BATCH)).fetchone()[0]
+        if last is not None:
+            archive.deleting = True
+            try:
+                with c:  # commit before DETACH
+                    c.execute(
+                        "DELETE FROM main.messages WHERE message_id IN "
+                        "(SELECT message_id FROM arch.messages_z WHERE message_id > ? AND message_id <= ?)",
+                        (after, last))
+            finally:
+                archive.deleting = False
+    finally:
+        c.execute("DETACH DATABASE arch")
+    return last
+
+
+def drop_partitions(c, before):
+    """Retention: forgets archived months before `before` (YYYYMM) and their
+    attachment rows; returns the files to delete. Rollups keep counting
+    them."""
+    parts = [p for p in archive.parts if p.month < before]
+    if parts:
+        c.execute("DELETE FROM archives WHERE month < ?", (before, ))
+        c.execute("DELETE FROM attachments WHERE ts < ?",
+                  (max(p.end_ts for p in parts), ))
+        archive.load(c)
+    return [p.path for p in parts]
+
+
+def vacuum_step(c):
+    """Frees up to VACUUM_PAGES pages; returns how many are still free."""
+    if c.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        # files created before v6: switching modes takes one full VACUUM
+        c.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        c.execute("VACUUM")
+        return 0
+    c.execute(f"PRAGMA incremental_vacuum({VACUUM_PAGES})").fetchall()
+    return c.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+def analyze_step(c):
+    # merge FTS segments a bit at a time, refresh stale planner statistics
+    c.execute("INSERT INTO messages_fts (messages_fts, rank) VALUES ('merge', 500)")
+    c.execute("PRAGMA analysis_limit = 1000")
+    c.execute("PRAGMA optimize")
+
+
+def db_bytes():
+    return sum(os.path.getsize(DB_PATH + suffix) for suffix in ("", "-wal")
+               if os.path.exists(DB_PATH + suffix))
+
+
+async def archive_month(month):
+    os.makedirs(archive.root, exist_ok=True)
+    name = f"messages_{month}.db"
+    path = os.path.join(archive.root, name)
+    rows, size = await db.read(build_archive, month, path)
+    await db.write(save_partition, month, name, rows, size)
+    after = 0
+    while after is not None:  # one batch per write, so ingest keeps flowing
+        after = await db.write(delete_archived, path, after)
+    print(f"🗄️ Archived {month}: {rows} messages, {size / 1e6:.1f} MB")
+
+
+async def maintain():
+    """Archive cold months, apply retention, then reclaim free pages and
+    refresh planner statistics, each in small steps on the writer."""
+    async with archive.lock:
+        before = db_bytes()
+        months = []
+        if ARCHIVE_AFTER_MONTHS > 0:
+            current = month_key(int(time.time() * 1000))
+            cutoff = month_bounds(add_months(current, -ARCHIVE_AFTER_MONTHS))[0]
+            with timed("maintenance_seconds", step="archive"):
+                for month in await db.read(archivable_months, cutoff):
+                    await archive_month(month)
+                    months.append(month)
+        if ARCHIVE_RETENTION_MONTHS > 0:
+            current = month_key(int(time.time() * 1000))
+            for path in await db.write(
+                    drop_partitions, add_months(current, -ARCHIVE_RETENTION_MONTHS)):
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(path)
+        with timed("maintenance_seconds", step="vacuum"):
+            free = await db.write(vacuum_step)
+            while free:
+                left = await db.write(vacuum_step)
+                if left >= free:
+                    break
+                free = left
+            await db.write(
+                lambda c: c.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall())
+        with timed("maintenance_seconds", step="analyze"):
+            await db.write(analyze_step)
+        archive.last_run = (time.time(), months, before - db_bytes())
+
+
+async def maintenance_loop():
+    if MAINTENANCE_HOURS <= 0:
+        return
+    await asyncio.sleep(60)  # let startup and the first crawls go first
+    while True:
+        try:
+            await maintain()
+        except Exception as e:
+            print("⚠️ Maintenance failed:", e)
+        await asyncio.sleep(MAINTENANCE_HOURS * 3600)
+
+
+def storage_stats(c):
+    hot, oldest = c.execute("SELECT COUNT(*), MIN(ts) FROM messages").fetchone()
+    pages, free, size = (c.execute(f"PRAGMA {name}").fetchone()[0] for name in
+                         ("page_count", "freelist_count", "page_size"))
+    return hot, oldest, pages * size, free * size
+
+
+@bot.command()
+async def storage(ctx, action: str = None):
+    if not await bot.is_owner(ctx.author):
+        await ctx.send("⚠️ Only the bot owner can manage storage.")
+        return
+    if action == "run":
+        if archive.lock.locked():
+            await ctx.send("⚠️ Maintenance is already running.")
+            return
+        await ctx.send("🧹 Running maintenance...")
+        await maintain()
+    hot, oldest, size, free = await db.read(storage_stats)
+    since = f", since {from_ms(oldest):%d-%m-%Y}" if oldest else ""
+    lines = [
+        "🗄️ **Storage**",
+        f"Hot: {hot:,} messages{since} | DB {db_bytes() / 1e6:.1f} MB "
+        f"({free / 1e6:.1f} MB free of {size / 1e6:.1f} MB)",
+        archive.summary(),
+    ]
+    if archive.last_run:
+        at, months, freed = archive.last_run
+        lines.append(
+            f"Last maintenance: {format_duration(time.time() - at)} ago, "
+            f"archived {len(months)} months, {freed / 1e6:.1f} MB freed")
+    await ctx.send("\n".join(lines))
+
+
+# ---------- Topics ----------
+DEFAULT_CATEGORIES = {
+    "Games": ["game", "play", "minecraft", "pubg", "fortnite", "gamer"],
+    "Music": ["song", "music", "lyrics", "beats"],
+    "Movies/Series": ["movie", "series", "netflix", "film"],
+    "Memes/Fun": ["meme", "funny", "joke", "haha"],
+    "Tech": ["tech", "computer", "app", "website"]
+}
+
+
+class TopicClassifier:
+    """Counts category keywords in a single regex pass over a text.
+
+    Keywords match whole words, optionally pluralised ("game" matches
+    "games" but not "endgame").
+    """
+
+    def __init__(self, categories):
+        self.categories = categories
+        self.topic_of = {
+            kw.lower(): topic
+            for topic, keywords in categories.items() for kw in keywords
+        }
+        words = sorted(self.topic_of, key=len, reverse=True)
+        self.pattern = re.compile(
+            r"\b(" + "|".join(map(re.escape, words)) + r")(?:s|es)?\b",
+            re.IGNORECASE) if words else None
+
+    def count(self, text):
+        counts = {}
+        if text and self.pattern:
+            for m in self.pattern.finditer(text):
+                topic = self.topic_of[m.group(1).lower()]
+                counts[topic] = counts.get(topic, 0) + 1
+        return counts
+
+
+DEFAULT_CLASSIFIER = TopicClassifier(DEFAULT_CATEGORIES)
+TOPIC_CLASSIFIERS = {}  # guild_id -> TopicClassifier for customised guilds
+
+
+def topic_json(guild_id, content):
+    counts = TOPIC_CLASSIFIERS.get(guild_id, DEFAULT_CLASSIFIER).count(content)
+    return json.dumps(counts) if counts else None
+
+
+def load_topic_categories(c):
+    categories = {}
+    for guild_id, topic, keyword in c.execute(
+            "SELECT guild_id, topic, keyword FROM topic_categories"):
+        categories.setdefault(guild_id, {}).setdefault(topic, []).append(keyword)
+    TOPIC_CLASSIFIERS.clear()
+    for guild_id, cats in categories.items():
+        TOPIC_CLASSIFIERS[guild_id] = TopicClassifier(cats)
+
+
+def save_topic_categories(c, guild_id, categories):
+    """Replace a guild's category set (None = back to the defaults) and
+    recount its history under the new keywords."""
+    c.execute("DELETE FROM topic_categories WHERE guild_id = ?", (guild_id, ))
+    if categories is None:
+        TOPIC_CLASSIFIERS.pop(guild_id, None)
+    else:
+        c.executemany(
+            "INSERT OR IGNORE INTO topic_categories (guild_id, topic, keyword) VALUES (?, ?, ?)",
+            [(guild_id, topic, kw.lower()) for topic, keywords in categories.items()
+             for kw in keywords])
+        TOPIC_CLASSIFIERS[guild_id] = TopicClassifier(categories)
+    rebuild_topics(c, guild_id)
+
+
+# ---------- helpers ----------
+DATE_REGEX = re.compile(r"^(\d{1,2})[/-](\d{1,2})[/-](\d{4})$")
+
+
+def parse_date(token: str):
+    m = DATE_REGEX.match(token)
+    if not m:
+        return None
+    d, mth, y = map(int, m.groups())
+    try:
+        return datetime(y, mth, d).date()
+    except ValueError:
+        return None
+
+
+def detect_channel(ctx, tokens):
+    for tok in tokens[:]:
+        if tok.startswith("<#") and tok.endswith(">"):
+            try:
+                cid = int(tok.strip("<#>"))
+                ch = ctx.guild.get_channel(cid)
+                if ch:
+                    tokens.remove(tok)
+                    return ch
+            except Exception:
+                pass
+    return ctx.channel
+
+
+def to_ms(dt):
+    return int(dt.timestamp() * 1000)
+
+
+def from_ms(ts):
+    return datetime.fromtimestamp(ts / 1000, tz=LOCAL_TZ)
+
+
+def local_day_bounds(day):
+    """UTC [start, end) datetimes covering `day` in LOCAL_TZ."""
+    start = datetime(day.year, day.month, day.day, tzinfo=LOCAL_TZ)
+    end = start + timedelta(days=1)
+    return start.astimezone(timezone.utc), end.astimezone(timezone.utc)
+
+
+def day_key(ts):
+    """LOCAL_TZ date of an epoch-ms timestamp as an int, e.g. 20250131."""
+    return int(from_ms(ts).strftime("%Y%m%d"))
+
+
+def local_day_range(day):
+    """Epoch-ms [start, end) of `day` in LOCAL_TZ, for `ts` range scans."""
+    start, end = local_day_bounds(day)
+    return to_ms(start), to_ms(end)
+
+
+def fts_phrase(keyword):
+    # quote as a single FTS5 phrase (last token prefix-matched) so user input
+    # can never be parsed as query syntax
+    return '"' + keyword.replace('"', '""') + '"*'
+
+
+def search_query(keyword=None, author_id=None, channel_id=None,
+                 date_filter=None, limit=1000, ranked=True, before=None):
+    """SQL + params searching the local messages table; rows are
+    (message_id, author, content, ts).
+
+    Keyword hits are ordered by rank unless `ranked` is False; otherwise
+    newest first, and `before=(ts, message_id)` continues from a keyset
+    cursor. Unranked keyword hits walk the FTS index by rowid (the message
+    snowflake, so already newest first) instead of scanning the channel
+    and probing FTS once per row.
+    """
+    clauses, params = [], []
+    order = "m.ts DESC, m.message_id DESC"
+    if keyword:
+        sql = ("SELECT m.message_id, m.author, m.content, m.ts FROM messages_fts "
+               "JOIN messages m ON m.message_id = messages_fts.rowid")
+        clauses.append("messages_fts MATCH ?")
+        params.append(fts_phrase(keyword))
+        order = "bm25(messages_fts)" if ranked else "messages_fts.rowid DESC"
+    else:
+        sql = "SELECT m.message_id, m.author, m.content, m.ts FROM messages m"
+    if before and keyword:
+        clauses.append("messages_fts.rowid < ?")
+        params.append(before[1])
+    elif before:
+        clauses.append("(m.ts < ? OR (m.ts = ? AND m.message_id < ?))")
+        params += [before[0], before[0], before[1]]
+    if author_id:
+        clauses.append("m.author_id = ?")
+        params.append(author_id)
+    if channel_id:
+        clauses.append("m.channel_id = ?")
+        params.append(channel_id)
+    if date_filter:
+        clauses.append("m.ts >= ? AND m.ts < ?")
+        params += local_day_range(date_filter)
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += f" ORDER BY {order} LIMIT ?"
+    params.append(limit)
+    return sql, params
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+# ---------- Ingestion ----------
+INSERT_MESSAGE_SQL = (
+    "INSERT OR IGNORE INTO messages (message_id, guild_id, channel_id, author_id, ts, author, channel, content, attachments) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)")
+INSERT_ATTACHMENT_SQL = (
+    "INSERT OR IGNORE INTO attachments (attachment_id, message_id, guild_id, channel_id, ts, day, kind, filename, ext, content_type, size, url) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".gif", ".webp")
+VIDEO_EXTS = (".mp4", ".mov", ".avi", ".mkv", ".webm")
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "200"))
+INGEST_FLUSH_MS = int(os.getenv("INGEST_FLUSH_MS", "500"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "10000"))
+
+
+def file_ext(filename):
+    return os.path.splitext(filename)[1].lower()
+
+
+def attachment_kind(filename, content_type):
+    ext = file_ext(filename)
+    if ext in IMAGE_EXTS:
+        return "image"
+    if ext in VIDEO_EXTS:
+        return "video"
+    if content_type and content_type.startswith(("image/", "video/")):
+        return content_type.split("/", 1)[0]
+    return "file"
+
+
+def attachment_rows(message):
+    ts = to_ms(message.created_at)
+    guild_id = message.guild.id if message.guild else None
+    return [(att.id, message.id, guild_id, message.channel.id, ts,
+             day_key(ts), attachment_kind(att.filename, att.content_type),
+             att.filename, file_ext(att.filename), att.content_type,
+             att.size, att.url) for att in message.attachments]
+
+
+def save_messages(c, batch):
+    """Insert (message_row, attachment_rows) pairs; returns new messages."""
+    if batch and min(row[4] for row, _ in batch) < archive.horizon:
+        batch = archive.unarchived(batch)
+    if LEGACY_UNTIL is not None:
+        replace_legacy(c, [row for row, _ in batch if row[4] <= LEGACY_UNTIL])
+    inserted = c.executemany(INSERT_MESSAGE_SQL,
+                             [row for row, _ in batch]).rowcount
+    c.executemany(INSERT_ATTACHMENT_SQL,
+                  [att for _, atts in batch for att in atts])
+    return inserted
+
+
+def message_row(message):
+    return (
+        message.id,
+        message.guild.id if message.guild else None,
+        message.channel.id,
+        message.author.id,
+        to_ms(message.created_at),
+        str(message.author),
+        str(message.channel),
+        message.content,
+        ",".join([att.url for att in message.attachments])
+        if message.attachments else None,
+    )
+
+
+class IngestQueue:
+    """Write-behind buffer: rows are queued by on_message and written in
+    batches by a background task, one transaction per batch."""
+
+    def __init__(self, batch_size, flush_ms, maxsize):
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.task = None
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.blocked = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.last_flush_ms = 0.0
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is None:
+            return
+        # sentinel: the writer flushes everything queued ahead of it and exits
+        await self.queue.put(None)
+        await self.task
+        self.task = None
+
+    async def put(self, row):
+        if self.queue.full():
+            # backpressure: the caller waits, the event loop does not
+            self.blocked += 1
+        await self.queue.put(row)
+        self.enqueued += 1
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            row = await self.queue.get()
+            if row is None:
+                return
+            batch = [row]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                if not self.queue.empty():
+                    row = self.queue.get_nowait()
+                else:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        row = await asyncio.wait_for(self.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if row is None:
+                    await self._flush(batch)
+                    return
+                batch.append(row)
+            await self._flush(batch)
+
+    async def _flush(self, batch):
+        start = time.perf_counter()
+        try:
+            await db.write(save_messages, batch)
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            self.errors += 1
+            print("DB error:", e)
+        self.last_flush_ms = (time.perf_counter() - start) * 1000
+
+    def metrics(self):
+        return {
+            "depth": self.queue.qsize(),
+            "max_depth": self.max_depth,
+            "capacity": self.queue.maxsize,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "batches": self.batches,
+            "blocked": self.blocked,
+            "errors": self.errors,
+            "last_flush_ms": self.last_flush_ms,
+        }
+
+
+ingest = IngestQueue(INGEST_BATCH_SIZE, INGEST_FLUSH_MS, INGEST_QUEUE_SIZE)
+
+
+# ---------- Auto-logging ----------
+@bot.event
+async def on_message(message):
+    if message.author.bot:
+        return
+    if message.content.startswith("!"):
+        await bot.process_commands(message)
+        return
+    await ingest.put((message_row(message), attachment_rows(message)))
+    await bot.process_commands(message)
+
+
+# ---------- Basic ----------
+@bot.command()
+async def hello(ctx):
+    await ctx.send(f"Hello <@{ctx.author.id}>! 👋")
+
+
+@bot.command()
+async def ping(ctx):
+    latency_ms = round(bot.latency * 1000)
+    await ctx.send(f"🏓 Pong! {latency_ms}ms")
+
+
+@bot.command()
+async def echo(ctx, *, text: str):
+    await ctx.send(text)
+
+
+@bot.command()
+async def info(ctx):
+    await ctx.send("ℹ️ I am alive and running!")
+
+
+# ---------- Index ----------
+INDEX_BATCH_SIZE = 500
+INDEX_LOCKS = {}
+
+
+def save_index_batch(c, rows, checkpoint):
+    inserted = save_messages(c, rows) if rows else 0
+    c.execute(
+        "INSERT OR REPLACE INTO index_checkpoints (channel_id, guild_id, newest_id, oldest_id, complete, updated_at, synced_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)", checkpoint)
+    return inserted
+
+
+class ChannelIndexer:
+    """Incremental, resumable indexer for one channel.
+
+    Fetches what is newer than the channel's newest_id watermark, then
+    backfills below oldest_id. Rows and the advanced watermarks are
+    committed together every INDEX_BATCH_SIZE messages, so a crash or
+    restart resumes from the last committed batch.
+    """
+
+    def __init__(self, channel, batch_size=INDEX_BATCH_SIZE):
+        self.channel = channel
+        self.batch_size = batch_size
+        self.rows = []
+        self.pending = 0
+        self.fetched = 0
+        self.inserted = 0
+        self.newest_id = None
+        self.oldest_id = None
+        self.complete = False
+        self.synced_at = None
+        self.backfill_from = None
+
+    async def load(self):
+        row = await db.fetchone(
+            "SELECT newest_id, oldest_id, complete, synced_at FROM index_checkpoints WHERE channel_id = ?",
+            (self.channel.id, ))
+        if row:
+            self.newest_id, self.oldest_id, self.synced_at = row[0], row[1], row[3]
+            self.complete = bool(row[2])
+        self.backfill_from = self.oldest_id
+
+    async def add(self, message):
+        self.fetched += 1
+        self.pending += 1
+        if self.backfill_from is None:
+            self.backfill_from = message.id
+        self.newest_id = max(self.newest_id or 0, message.id)
+        self.oldest_id = min(self.oldest_id or message.id, message.id)
+        if not message.author.bot:
+            self.rows.append((message_row(message), attachment_rows(message)))
+        if self.pending >= self.batch_size:
+            await self.flush()
+
+    async def flush(self, force=False):
+        if not self.pending and not force:
+            return
+        guild_id = self.channel.guild.id if getattr(self.channel, "guild", None) else None
+        checkpoint = (self.channel.id, guild_id, self.newest_id, self.oldest_id,
+                      int(self.complete), int(time.time() * 1000),
+                      self.synced_at)
+        self.inserted += await db.write(save_index_batch, self.rows, checkpoint)
+        self.rows = []
+        self.pending = 0
+
+    async def run(self, limit, forward=True, backfill=True, until_id=None):
+        """Fetch up to `limit` un-indexed messages (None = no limit).
+
+        `until_id` stops the backfill at that snowflake instead of the
+        channel start.
+        """
+        async with INDEX_LOCKS.setdefault(self.channel.id, asyncio.Lock()):
+            await self.load()
+            started = int(time.time() * 1000)
+            # forward: only what arrived since the last run
+            if forward and self.newest_id:
+                got = 0
+                async for message in fetch_history(
+                        self.channel, limit=limit, after=discord.Object(id=self.newest_id),
+                        oldest_first=True):
+                    await self.add(message)
+                    got += 1
+                if limit is None or got < limit:
+                    self.synced_at = started
+            # backward: continue the backfill below the low watermark
+            remaining = None if limit is None else limit - self.fetched
+            if (backfill and (remaining is None or remaining > 0)
+                    and not self.complete):
+                if self.oldest_id is None:
+                    # first crawl starts at the newest message
+                    self.synced_at = started
+                before = discord.Object(
+                    id=self.oldest_id) if self.oldest_id else None
+                after = discord.Object(id=until_id) if until_id else None
+                got = 0
+                async for message in fetch_history(
+                        self.channel, limit=remaining, before=before, after=after,
+                        oldest_first=False):
+                    await self.add(message)
+                    got += 1
+                if remaining is None or got < remaining:
+                    if until_id is None:
+                        self.complete = True
+                    else:
+                        # everything down to until_id is indexed now
+                        self.oldest_id = min(self.oldest_id or until_id,
+                                             until_id)
+            await self.flush(force=True)
+        return self
+
+
+# ---------- Query planner ----------
+PLANNER_LIMIT = 1000
+PLANNER_CONCURRENCY = 4
+PLANNER_WINDOW_LIMIT = 20000
+LIVE_SINCE = None  # ms; on_message has been logging everything since then
+
+
+def save_window(c, rows, window):
+    inserted = save_messages(c, rows) if rows else 0
+    if window:
+        c.execute(
+            "INSERT OR IGNORE INTO indexed_windows (channel_id, start_id, end_id) VALUES (?, ?, ?)",
+            window)
+    return inserted
+
+
+async def index_window(channel, start_id, end_id, limit=PLANNER_WINDOW_LIMIT):
+    """Index the messages of `channel` with start_id <= id < end_id.
+
+    The bounds go to the API as after/before snowflakes, so the cost is the
+    window's own traffic no matter how far back it lies. The window is
+    recorded as covered only if it was fetched to the end.
+    """
+    rows = []
+    got = 0
+    async for message in fetch_history(
+            channel, limit=limit, after=discord.Object(id=start_id - 1),
+            before=discord.Object(id=end_id), oldest_first=True):
+        got += 1
+        if not message.author.bot:
+            rows.append((message_row(message), attachment_rows(message)))
+        if len(rows) >= INDEX_BATCH_SIZE:
+            await db.write(save_window, rows, None)
+            rows = []
+    done = limit is None or got < limit
+    await db.write(save_window, rows,
+                   (channel.id, start_id, end_id) if done else None)
+
+
+async def plan_channel(channel, limit=PLANNER_LIMIT, window=None):
+    """Bring the local index of `channel` up to date before a query.
+
+    Only what the index does not cover is fetched from Discord, then the
+    query reads everything from SQLite:
+    - no window: messages above the high watermark (none at all while live
+      ingestion has been running since the last crawl reached the channel
+      head); a channel never indexed gets its newest `limit` messages.
+    - a `window` of (start, end) datetimes that reaches the present is
+      crawled down from the head to `start`.
+    - a past window is fetched on its own with snowflake bounds, minus
+      whatever the checkpointed range or an earlier window already covers.
+    """
+    row = await db.fetchone(
+        "SELECT newest_id, oldest_id, complete, synced_at FROM index_checkpoints WHERE channel_id = ?",
+        (channel.id, ))
+    newest_id, oldest_id, complete, synced_at = row or (None, None, 0, None)
+    stale = not (LIVE_SINCE and synced_at and synced_at >= LIVE_SINCE)
+    if window is None:
+        if row is None:
+            await ChannelIndexer(channel).run(limit)
+        elif stale:
+            await ChannelIndexer(channel).run(limit, backfill=False)
+        return
+    start_id = discord.utils.time_snowflake(window[0])
+    end_id = discord.utils.time_snowflake(window[1])
+    if window[1] > datetime.now(timezone.utc):
+        covered = complete or (oldest_id and oldest_id <= start_id)
+        if stale or not covered:
+            await ChannelIndexer(channel).run(limit, forward=stale,
+                                              backfill=not covered,
+                                              until_id=start_id)
+        return
+    if oldest_id and newest_id:
+        low_covered = complete or oldest_id <= start_id
+        # above the high watermark is covered while live ingestion is current
+        high_covered = newest_id >= end_id or not stale
+        if low_covered and high_covered:
+            return
+        if low_covered:
+            start_id = max(start_id, newest_id + 1)
+        elif high_covered and oldest_id < end_id:
+            end_id = oldest_id
+    elif complete and not stale:
+        return
+    if await db.fetchone(
+            "SELECT 1 FROM indexed_windows WHERE channel_id = ? AND start_id <= ? AND end_id >= ?",
+            (channel.id, start_id, end_id)):
+        return
+    await index_window(channel, start_id, end_id)
+
+
+async def plan_guild(guild, window=None):
+    """plan_channel for every channel of `guild` that has been indexed."""
+    rows = await db.fetchall(
+        "SELECT channel_id FROM index_checkpoints WHERE guild_id = ?",
+        (guild.id, ))
+    sem = asyncio.Semaphore(PLANNER_CONCURRENCY)
+
+    async def plan(channel):
+        async with sem:
+            try:
+                await plan_channel(channel, window=window)
+            except discord.HTTPException as e:
+                print(f"Planner skipped {channel}: {e}")
+
+    channels = [guild.get_channel_or_thread(cid) for cid, in rows]
+    await asyncio.gather(*(plan(ch) for ch in channels if ch))
+
+
+# ---------- Help ----------
+HELP_SECTIONS = {}  # extension name -> its part of !helpme
+ADMIN_HELP = """🛠️ **Admin**
+!metrics, !storage [run]"""
+
+
+@bot.command()
+async def helpme(ctx):
+    help_text = "\n\n".join(list(HELP_SECTIONS.values()) + [ADMIN_HELP])
+    await ctx.send("\n" + help_text + "\n")
+
+
+# ---------- Ready ----------
+@bot.event
+async def on_ready():
+    global LIVE_SINCE
+    # a fresh READY means events may have been missed while disconnected
+    LIVE_SINCE = int(time.time() * 1000)
+    if bot.ready_after is None:
+        bot.ready_after = time.perf_counter() - STARTED_AT
+    print(f"✅ Logged in as {bot.user} (ID: {bot.user.id}) "
+          f"in {bot.ready_after:.1f}s")
+    channels = [(ch.id, g.id, str(ch)) for g in bot.guilds
+                for ch in g.text_channels]
+    authors = {(m.id, str(m)) for g in bot.guilds for m in g.members}
+    await db.write(backfill_legacy_ids, channels, list(authors))
+
+
+# ---------- Run ----------
+DEFERRED_IMPORTS = ("reportlab.platypus", "yt_dlp", "numpy")  # imported on first use
+
+
+def installed(name):
+    try:
+        return importlib.util.find_spec(name) is not None
+    except ModuleNotFoundError:  # parent package missing
+        return False
+
+
+def profile_imports(top=15):
+    """Import-time report (`python bot.py --profile-imports`): what startup
+    imports cost, per extension, and what first use of PDF/music adds.
+    Deferred modules that are not installed (optional ones like NumPy) are
+    left out."""
+    deferred = [name for name in DEFERRED_IMPORTS if installed(name)]
+    for name in DEFERRED_IMPORTS:
+        if name not in deferred:
+            print(f"  skipping {name} (not installed)")
+    modules = ["core"] + EXTENSIONS + deferred
+    code = "; ".join(f"import {name}" for name in modules)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          capture_output=True, text=True,
+                          cwd=os.path.dirname(os.path.abspath(__file__)))
+    roots, children = [], []
+    # -X importtime lines: "import time: self [us] | cumulative | package",
+    # children listed before their parent, nesting shown by indentation
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split(":", 1)[1].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        entry = (int(cumulative), name.strip())
+        if depth == 1:
+            children.append(entry)
+        elif depth == 0:
+            roots.append((entry, children))
+            children = []
+    if proc.returncode != 0 or not roots:
+        print(proc.stderr[-2000:])
+        return
+    for (us, name), kids in roots:
+        if name not in modules:
+            continue  # interpreter startup
+        tag = " (deferred)" if name in DEFERRED_IMPORTS else ""
+        print(f"{us / 1000:9.1f}ms  {name}{tag}")
+        if name == "core":
+            for kid_us, kid in sorted(kids, reverse=True)[:top]:
+                print(f"{kid_us / 1000:9.1f}ms    {kid}")
+
+
+def main():
+    if "--profile-imports" in sys.argv:
+        profile_imports()
+    elif not TOKEN:
+        print("❌ DISCORD_TOKEN not set in environment.")
+    else:
+        bot.run("##")
\ No newline at end of file
@@ -0,0 +1,82 @@
+"""Code that runs in the PDF process pool.
+
+Spawned workers import this module fresh, so it must never import core:
+that would build a second client, DB threads and command registry in every
+worker. core.py imports open_archive from here as well.
+"""
+import os
+import zlib
+import heapq
+import sqlite3
+import itertools
+from datetime import datetime
+
+
+def open_archive(path):
+    """Read-only connection to an archived month with inflate() registered."""
+    c = sqlite3.connect(f"file:{path}?mode=ro", uri=True,
+                        check_same_thread=False)
+    zdict = c.execute("SELECT value FROM meta WHERE key = 'zdict'").fetchone()[0]
+
+    def inflate(value):
+        if isinstance(value, bytes):
+            return zlib.decompressobj(-15, zdict).decompress(value).decode()
+        return value
+
+    c.create_function("inflate", 1, inflate, deterministic=True)
+    return c
+
+
+def merged_rows(cursors):
+    """(author, content, ts) in ts order across partitions whose rows are
+    (message_id, author, content, ts) sorted by (ts, message_id)."""
+    last = None
+    for row in heapq.merge(*cursors, key=lambda r: (r[3], r[0])):
+        if row[0] != last:
+            last = row[0]
+            yield row[1:]
+
+
+def render_summary_pdfs(sources, sql, params, title, tz_name, out_prefix,
+                        rows_per_file):
+    """Runs in a worker process: stream the day's rows from SQLite (the hot
+    database, then any archived month files) and write one PDF per
+    `rows_per_file` messages, so only one part's flowables are ever held
+    in memory. Returns the paths written."""
+    from xml.sax.saxutils import escape
+    from zoneinfo import ZoneInfo
+    # reportlab is only needed here, in the worker, not at bot startup
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet
+    tz = ZoneInfo(tz_name)
+    styles = getSampleStyleSheet()
+    conns = [sqlite3.connect(f"file:{sources[0]}?mode=ro", uri=True)]
+    try:
+        conns += [open_archive(path) for path in sources[1:]]
+        stream = merged_rows([conn.execute(sql, params) for conn in conns])
+        paths = []
+        while True:
+            rows = list(itertools.islice(stream, rows_per_file))
+            if not rows:
+                break
+            part = len(paths) + 1
+            path = f"{out_prefix}_p{part}.pdf"
+            heading = title if part == 1 else f"{title} (part {part})"
+            story = [Paragraph(escape(heading), styles['Title']), Spacer(1, 12)]
+            for author, content, ts in rows:
+                timestamp = datetime.fromtimestamp(ts / 1000, tz).strftime("%H:%M")
+                story.append(
+                    Paragraph(f"<b>{escape(author or '')}</b> [{timestamp}]:",
+                              styles['Heading4']))
+                story.append(
+                    Paragraph(escape(content) if content else "[No content]",
+                              styles['BodyText']))
+                story.append(Spacer(1, 12))
+            SimpleDocTemplate(path + ".tmp", pagesize=letter).build(story)
+            os.replace(path + ".tmp", path)
+            paths.append(path)
+    finally:
+        for conn in conns:
+            conn.close()
+    return paths